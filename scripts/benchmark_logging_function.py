@@ -0,0 +1,51 @@
+"""MyLogger.logging_function のデコレーターによる1呼び出しあたりのオーバーヘッドを計測するベンチマーク
+
+PYTHONPATH=src python scripts/benchmark_logging_function.py [calls]
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-1")
+
+from luciferous_devio_index.common.logger import MyLogger  # noqa: E402
+from luciferous_devio_index.common.logger.my_logger import (  # noqa: E402
+    ENVIRONMENT_NAME_DISABLE_TIMING,
+)
+
+DEFAULT_CALLS = 200_000
+
+logger = MyLogger(__name__)
+
+
+def target(x: int) -> int:
+    return x
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CALLS
+    bare = measure(func=target, calls=calls)
+
+    cases = [
+        ("default", logger.logging_function()(target)),
+        ("sample_rate=0.1", logger.logging_function(sample_rate=0.1)(target)),
+        ("sample_rate=0.01", logger.logging_function(sample_rate=0.01)(target)),
+    ]
+    os.environ[ENVIRONMENT_NAME_DISABLE_TIMING] = "true"
+    cases.append(("timing disabled", logger.logging_function()(target)))
+    del os.environ[ENVIRONMENT_NAME_DISABLE_TIMING]
+
+    print("| case | ns/call | overhead ns/call |")
+    print("|---|--:|--:|")
+    print(f"| bare | {bare:.0f} | 0 |")
+    for name, func in cases:
+        ns = measure(func=func, calls=calls)
+        print(f"| {name} | {ns:.0f} | {ns - bare:.0f} |")
+
+
+def measure(*, func, calls: int) -> float:
+    return min(timeit.repeat(lambda: func(1), number=calls, repeat=3)) / calls * 1e9
+
+
+if __name__ == "__main__":
+    main()
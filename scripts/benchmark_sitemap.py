@@ -0,0 +1,109 @@
+"""サイトマップのパース時間とピークRSSを計測するベンチマーク
+
+PYTHONPATH=src python scripts/benchmark_sitemap.py [entries ...]
+
+各計測は子プロセスで実行し、パース前後の ru_maxrss の差分をピークRSSの増分とする。
+BeautifulSoupがインストールされている場合は旧実装 (DOM全体を構築する方式) とも比較する。
+"""
+import gzip
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from os.path import join
+
+DEFAULT_ENTRIES = [1_000, 10_000, 100_000]
+
+URL_TEMPLATE = """<url>
+<loc>https://dev.classmethod.jp/articles/benchmark-slug-{index}/</loc>
+<lastmod>2023-04-20T10:11:12+09:00</lastmod>
+</url>
+"""
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(run_child(parser=sys.argv[2], path=sys.argv[3])))
+        return
+    list_entries = [int(x) for x in sys.argv[1:]] or DEFAULT_ENTRIES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(
+            "| entries | parser | compressed | parse time (sec) | peak RSS delta (MiB) |"
+        )
+        print("|--:|---|---|--:|--:|")
+        for entries in list_entries:
+            path = create_sitemap(entries=entries, tmp_dir=tmp_dir)
+            for parser, target in [
+                ("streaming", path),
+                ("streaming", f"{path}.gz"),
+                ("bs4", path),
+            ]:
+                result = exec_child(parser=parser, path=target)
+                if result is None:
+                    continue
+                print(
+                    f"| {entries:,} | {parser} | {target.endswith('.gz')} "
+                    f"| {result['sec']:.3f} | {result['rss_mib']:.1f} |"
+                )
+
+
+def create_sitemap(*, entries: int, tmp_dir: str) -> str:
+    path = join(tmp_dir, f"sitemap-{entries}.xml")
+    body = "".join(URL_TEMPLATE.format(index=i) for i in range(entries))
+    text = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        f"{body}</urlset>\n"
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(text)
+    with gzip.open(f"{path}.gz", "wb") as f:
+        f.write(text)
+    return path
+
+
+def exec_child(*, parser: str, path: str):
+    resp = subprocess.run(
+        [sys.executable, __file__, "--child", parser, path], capture_output=True
+    )
+    if resp.returncode != 0:
+        print(f"skip {parser}: {resp.stderr.decode().strip().splitlines()[-1]}")
+        return None
+    return json.loads(resp.stdout.decode().strip().splitlines()[-1])
+
+
+def run_child(*, parser: str, path: str) -> dict:
+    if parser == "streaming":
+        from luciferous_devio_index.common.sitemap import parse_individual_sitemap
+
+        def parse(fp):
+            return sum(1 for _ in parse_individual_sitemap(fp=fp, url=path))
+
+    else:
+        from bs4 import BeautifulSoup
+
+        def parse(fp):
+            count = 0
+            for tag in BeautifulSoup(fp.read(), "xml").select("url"):
+                tag.select_one("loc").text.split("/")
+                datetime.strptime(
+                    tag.select_one("lastmod").text, "%Y-%m-%dT%H:%M:%S%z"
+                ).timestamp()
+                count += 1
+            return count
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(path, "rb") as fp:
+        count = parse(fp)
+    sec = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"count": count, "sec": sec, "rss_mib": (rss_after - rss_before) / 1024}
+
+
+if __name__ == "__main__":
+    main()
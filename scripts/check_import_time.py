@@ -0,0 +1,120 @@
+"""lambda_handler の各エントリーポイントのimport時間を計測し、予算を超えていれば失敗する
+
+`python -X importtime` の出力をパッケージごとに集計して表示する。
+
+PYTHONPATH=src python scripts/check_import_time.py [--repeat N] [--top N] [handler ...]
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+PACKAGE_HANDLER = "luciferous_devio_index.lambda_handler"
+DIR_HANDLER = Path(__file__).parent.parent / "src/luciferous_devio_index/lambda_handler"
+MARKER = "--- import start ---"
+
+# ハンドラーごとのimport時間の予算 (ミリ秒)
+DEFAULT_BUDGET_MS = 200
+BUDGET_MS: Dict[str, float] = {}
+
+DEFAULT_REPEAT = 3
+DEFAULT_TOP = 5
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    total_us: int
+    self_us_by_package: Dict[str, int]
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = pop_option(args=args, name="--repeat", default=DEFAULT_REPEAT)
+    top = pop_option(args=args, name="--top", default=DEFAULT_TOP)
+    handlers = args or list_handlers()
+
+    failed = []
+    print("| handler | import ms | budget ms | result |")
+    print("|---|--:|--:|---|")
+    results = {}
+    for handler in handlers:
+        result = measure(module=f"{PACKAGE_HANDLER}.{handler}", repeat=repeat)
+        results[handler] = result
+        budget = BUDGET_MS.get(handler, DEFAULT_BUDGET_MS)
+        ms = result.total_us / 1000
+        ok = ms <= budget
+        if not ok:
+            failed.append(handler)
+        print(f"| {handler} | {ms:.1f} | {budget} | {'ok' if ok else 'OVER'} |")
+
+    for handler, result in results.items():
+        print(f"\n{handler}:")
+        packages = sorted(
+            result.self_us_by_package.items(), key=lambda x: x[1], reverse=True
+        )
+        for package, us in packages[:top]:
+            print(f"  {package:<32} {us / 1000:8.1f} ms")
+
+    if failed:
+        print(f"\nimport time budget exceeded: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+def pop_option(*, args: List[str], name: str, default: int) -> int:
+    if name not in args:
+        return default
+    index = args.index(name)
+    value = int(args[index + 1])
+    del args[index : index + 2]
+    return value
+
+
+def list_handlers() -> List[str]:
+    return sorted(p.stem for p in DIR_HANDLER.glob("*.py") if p.stem != "__init__")
+
+
+def measure(*, module: str, repeat: int) -> ImportTime:
+    # キャッシュの影響をならすため、新しいプロセスで複数回計測して最短のものを使う
+    results = [run_importtime(module=module) for _ in range(repeat)]
+    return min(results, key=lambda x: x.total_us)
+
+
+def run_importtime(*, module: str) -> ImportTime:
+    env = {"AWS_DEFAULT_REGION": "ap-northeast-1", **os.environ}
+    code = (
+        f"import sys; print({MARKER!r}, file=sys.stderr, flush=True); import {module}"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    )
+    lines = proc.stderr.splitlines()
+    return parse_importtime(lines=lines[lines.index(MARKER) + 1 :])
+
+
+def parse_importtime(*, lines: List[str]) -> ImportTime:
+    total_us = 0
+    self_us_by_package: Dict[str, int] = defaultdict(int)
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # ヘッダー行
+            continue
+        self_us_by_package[name.strip().split(".")[0]] += int(self_us)
+        if not name.startswith("  "):
+            # インデントのない行がトップレベルのimportで、累積時間がimport全体の時間になる
+            total_us += int(cumulative_us)
+    return ImportTime(total_us=total_us, self_us_by_package=dict(self_us_by_package))
+
+
+if __name__ == "__main__":
+    main()
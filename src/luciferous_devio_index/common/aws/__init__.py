@@ -1 +1 @@
-from .aws import create_client, create_resource
+from .aws import create_client, create_resource, get_client, get_resource
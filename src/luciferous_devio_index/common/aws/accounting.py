@@ -0,0 +1,80 @@
+from typing import TYPE_CHECKING
+
+from luciferous_devio_index.common.logger import CounterBorg
+
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+counter = CounterBorg()
+
+OPERATIONS_CONSUMED_CAPACITY = {
+    "BatchGetItem",
+    "BatchWriteItem",
+    "DeleteItem",
+    "GetItem",
+    "PutItem",
+    "Query",
+    "Scan",
+    "TransactGetItems",
+    "TransactWriteItems",
+    "UpdateItem",
+}
+
+
+def create_group(event_name: str) -> str:
+    # event_nameは `after-call.dynamodb.GetItem` のような形式
+    _, service, operation = event_name.split(".", 2)
+    return f"aws:{service}:{operation}"
+
+
+def request_consumed_capacity(params: dict, model, **kwargs):
+    if model.name in OPERATIONS_CONSUMED_CAPACITY:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def count_request(request, event_name: str, **kwargs):
+    # before-sendはリトライを含めて送信のたびに呼ばれる
+    group = create_group(event_name)
+    counter.add(group, "attempts")
+    length = request.headers.get("Content-Length")
+    if length is not None:
+        counter.add(group, "request_bytes", int(length))
+    elif request.body is not None and hasattr(request.body, "__len__"):
+        counter.add(group, "request_bytes", len(request.body))
+
+
+def count_response(http_response, parsed: dict, event_name: str, **kwargs):
+    group = create_group(event_name)
+    counter.add(group, "calls")
+    metadata = parsed.get("ResponseMetadata", {})
+    counter.add(group, "retries", metadata.get("RetryAttempts", 0))
+    # ストリーミングのボディを読み込まないようにContent-Lengthで数える
+    length = http_response.headers.get("content-length")
+    if length is not None and length.isdigit():
+        counter.add(group, "response_bytes", int(length))
+
+    consumed = parsed.get("ConsumedCapacity")
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    for item in consumed or []:
+        counter.add(group, "consumed_capacity", item.get("CapacityUnits", 0))
+
+
+def register_accounting(client: "BaseClient") -> "BaseClient":
+    """クライアントにAPI呼び出しの回数・リトライ・消費キャパシティ・ペイロードのバイト数を数えるフックを登録する
+
+    集計値は `CounterBorg` に `aws:サービス名:オペレーション名` のグループで記録され、
+    ハンドラーの function stats のログに出力される。
+
+    Args:
+        client: boto3のクライアント
+
+    Returns:
+        フックを登録したクライアント
+    """
+    events = client.meta.events
+    if client.meta.service_model.service_name == "dynamodb":
+        events.register("before-parameter-build.dynamodb", request_consumed_capacity)
+    events.register("before-send", count_request)
+    events.register("after-call", count_response)
+    return client
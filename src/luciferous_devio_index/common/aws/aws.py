@@ -1,24 +1,184 @@
-from typing import Optional
+import os
+from functools import partial
+from threading import RLock
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, cast
 
-import boto3
-from boto3.resources.base import ServiceResource
-from botocore.client import BaseClient
-from botocore.config import Config
+from .accounting import register_accounting
 
-CONFIG_DEFAULT = Config(connect_timeout=5, read_timeout=5, retries={"mode": "standard"})
+if TYPE_CHECKING:
+    import boto3
+    from boto3.resources.base import ServiceResource
+    from botocore.client import BaseClient
+    from botocore.config import Config
 
+ENV_MAX_POOL_CONNECTIONS = "BOTO_MAX_POOL_CONNECTIONS"
+ENV_CONNECT_TIMEOUT = "BOTO_CONNECT_TIMEOUT"
+ENV_READ_TIMEOUT = "BOTO_READ_TIMEOUT"
 
-def create_client(
-    name: str, *, config: Optional[Config] = None, **kwargs
-) -> BaseClient:
-    return boto3.client(
-        name, config=CONFIG_DEFAULT if config is None else config, **kwargs
+lock = RLock()
+registry_clients: Dict[str, "BaseClient"] = {}
+registry_resources: Dict[str, "ServiceResource"] = {}
+sessions: Dict[str, Any] = {}
+
+
+def create_default_config() -> "Config":
+    """環境変数からクライアントの設定を作成する
+
+    Returns:
+        接続プールのサイズとタイムアウトを設定したConfig
+    """
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get(ENV_MAX_POOL_CONNECTIONS, "10")),
+        connect_timeout=float(os.environ.get(ENV_CONNECT_TIMEOUT, "5")),
+        read_timeout=float(os.environ.get(ENV_READ_TIMEOUT, "5")),
+        retries={"mode": "standard"},
     )
 
 
+def get_session() -> "boto3.session.Session":
+    """プロセス内で共有するセッションを取得する
+
+    boto3のimportも含めて初回の呼び出し時に行う。
+    """
+    import boto3.session
+    import botocore.session
+
+    with lock:
+        if "boto3" not in sessions:
+            botocore_session = botocore.session.get_session()
+            sessions["botocore"] = botocore_session
+            sessions["boto3"] = boto3.session.Session(botocore_session=botocore_session)
+        return sessions["boto3"]
+
+
+def build_client(
+    name: str, *, config: Optional["Config"] = None, **kwargs
+) -> "BaseClient":
+    with lock:
+        client = get_session().client(
+            name, config=create_default_config() if config is None else config, **kwargs
+        )
+    return register_accounting(client)
+
+
+def build_resource(
+    name: str, *, config: Optional["Config"] = None, **kwargs
+) -> "ServiceResource":
+    with lock:
+        resource = get_session().resource(
+            name, config=create_default_config() if config is None else config, **kwargs
+        )
+    register_accounting(resource.meta.client)
+    return resource
+
+
+def get_client(name: str) -> "BaseClient":
+    """プロセス内で共有するクライアントを取得する
+
+    初回の呼び出し時に作成し、以降は同じクライアントを返す。
+
+    Args:
+        name: サービス名
+
+    Returns:
+        クライアント
+    """
+    with lock:
+        if name not in registry_clients:
+            registry_clients[name] = build_client(name)
+        return registry_clients[name]
+
+
+def get_resource(name: str) -> "ServiceResource":
+    """プロセス内で共有するリソースを取得する
+
+    初回の呼び出し時に作成し、以降は同じリソースを返す。
+    DynamoDBのリソースは自身のクライアントにPythonの型を変換するフックを登録するため、
+    `get_client` のクライアントとは共有しない。リソースを使う処理で例外クラスなどが必要な場合は、
+    `resource.meta.client` (値はPythonの型) を使うと接続プールが1つで済む。
+
+    Args:
+        name: サービス名
+
+    Returns:
+        リソース
+    """
+    with lock:
+        if name not in registry_resources:
+            registry_resources[name] = build_resource(name)
+        return registry_resources[name]
+
+
+class LazyProxy:
+    """最初に属性へアクセスされたときに対象を作成するプロキシ"""
+
+    __slots__ = ("factory", "target")
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.target = None
+
+    def get_target(self) -> Any:
+        if self.target is None:
+            with lock:
+                if self.target is None:
+                    self.target = self.factory()
+        return self.target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get_target(), name)
+
+    def __repr__(self) -> str:
+        if self.target is None:
+            return f"<LazyProxy {self.factory!r}>"
+        return repr(self.target)
+
+
+def create_client(
+    name: str, *, config: Optional["Config"] = None, **kwargs
+) -> "BaseClient":
+    """クライアントを遅延して作成する
+
+    引数を省略した場合は `get_client` の共有クライアントを、指定した場合は専用のクライアントを
+    最初に使われたときに作成する。ハンドラーのデフォルト引数で使っても初期化時の負荷にならない。
+
+    Args:
+        name: サービス名
+        config: クライアントの設定
+        **kwargs: `boto3.session.Session.client` に渡す引数
+
+    Returns:
+        クライアントのプロキシ (属性へのアクセスはクライアントに委譲する)
+    """
+    if config is None and not kwargs:
+        proxy = LazyProxy(partial(get_client, name))
+    else:
+        proxy = LazyProxy(partial(build_client, name, config=config, **kwargs))
+    # プロキシは属性へのアクセスをすべて委譲するため、呼び出し側ではクライアントとして型付けする
+    return cast("BaseClient", proxy)
+
+
 def create_resource(
-    name: str, *, config: Optional[Config] = None, **kwargs
-) -> ServiceResource:
-    return boto3.resource(
-        name, config=CONFIG_DEFAULT if config is None else config, **kwargs
-    )
+    name: str, *, config: Optional["Config"] = None, **kwargs
+) -> "ServiceResource":
+    """リソースを遅延して作成する
+
+    引数を省略した場合は `get_resource` の共有リソースを、指定した場合は専用のリソースを
+    最初に使われたときに作成する。
+
+    Args:
+        name: サービス名
+        config: クライアントの設定
+        **kwargs: `boto3.session.Session.resource` に渡す引数
+
+    Returns:
+        リソースのプロキシ (属性へのアクセスはリソースに委譲する)
+    """
+    if config is None and not kwargs:
+        proxy = LazyProxy(partial(get_resource, name))
+    else:
+        proxy = LazyProxy(partial(build_resource, name, config=config, **kwargs))
+    # プロキシは属性へのアクセスをすべて委譲するため、呼び出し側ではリソースとして型付けする
+    return cast("ServiceResource", proxy)
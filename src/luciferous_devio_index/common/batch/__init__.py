@@ -0,0 +1 @@
+from .batch import BatchResult, process_sqs_batch
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+
+@dataclass
+class BatchResult:
+    succeeded: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+
+    def to_response(self) -> dict:
+        """SQSのイベントソースの `ReportBatchItemFailures` に返す形式に変換する"""
+        return {"batchItemFailures": [{"itemIdentifier": x} for x in self.failed]}
+
+
+def process_sqs_batch(
+    *, event: dict, process_record: Callable[[dict], None]
+) -> Optional[dict]:
+    """SQSのイベントのレコードを1件ずつ処理し、失敗したレコードだけを報告する
+
+    レコードごとの例外は記録して次のレコードに進み、失敗したレコードだけをキューに戻させる。
+    全件が失敗した場合は最初の例外を送出し、Lambdaのエラーとして通知させる。
+    `Records` を含まないイベント (直接の呼び出し) はイベント自体を1件のレコードとして処理する。
+
+    Args:
+        event: SQSのイベント
+        process_record: レコードを処理する関数
+
+    Returns:
+        `batchItemFailures` を含むレスポンス (直接の呼び出しの場合は `None`)
+    """
+    if "Records" not in event:
+        process_record(event)
+        return None
+    result = BatchResult()
+    errors: List[Exception] = []
+    for record in event["Records"]:
+        message_id = record["messageId"]
+        try:
+            process_record(record)
+        except Exception as e:
+            logger.warning(
+                "failed to process record",
+                message_id=message_id,
+                error=e,
+                exc_info=True,
+            )
+            errors.append(e)
+            result.failed.append(message_id)
+        else:
+            result.succeeded.append(message_id)
+    counter.add("batch", "succeeded", len(result.succeeded))
+    counter.add("batch", "failed", len(result.failed))
+    logger.info(
+        "processed batch", succeeded=len(result.succeeded), failed=result.failed
+    )
+    if errors and not result.succeeded:
+        raise errors[0]
+    return result.to_response()
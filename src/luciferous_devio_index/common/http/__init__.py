@@ -1,3 +1,39 @@
-from .http import create_http_client
+from luciferous_devio_index.common.rate_limiter import (
+    create_rate_limiter_from_environment,
+)
 
-http_client_sec3 = create_http_client(3)
+from .adaptive import AdaptiveInterval
+from .http import NotModified, create_http_client, save_validator
+from .pool import ConnectionPool, PooledResponse, default_pool
+from .validator_store import (
+    DynamoDbValidatorStore,
+    FileValidatorStore,
+    MemoryValidatorStore,
+    S3ValidatorStore,
+    Validator,
+    ValidatorStore,
+    create_validator_store,
+)
+
+rate_limiter_devio = create_rate_limiter_from_environment()
+adaptive_devio = AdaptiveInterval(sec=3, min_sec=1, max_sec=60)
+http_client_sec3 = create_http_client(
+    3, rate_limiter=rate_limiter_devio, adaptive=adaptive_devio
+)
+
+
+def __getattr__(name: str):
+    # asyncioのimportは重いため、非同期クライアントは最初に参照されたときにimportする
+    if name in ("FetchedResponse", "create_async_http_client", "fetch_all"):
+        from . import async_http
+
+        return getattr(async_http, name)
+    if name == "async_http_client_sec3":
+        from .async_http import create_async_http_client
+
+        client = create_async_http_client(
+            3, rate_limiter=rate_limiter_devio, adaptive=adaptive_devio
+        )
+        globals()[name] = client
+        return client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from random import uniform
+from typing import Optional
+
+from luciferous_devio_index.common.logger import CounterBorg
+
+counter = CounterBorg()
+
+
+class AdaptiveInterval(object):
+    """AIMD (加算増加・乗算減少) でリクエスト間隔を調整する
+
+    応答が速く成功している間はリクエストレートを `increase_step` ずつ上げ、
+    429や5xxを受けた場合は間隔を `decrease_factor` 倍に広げる。
+
+    Args:
+        sec: 初期のリクエスト間隔 (秒)
+        min_sec: 最小のリクエスト間隔 (秒)
+        max_sec: 最大のリクエスト間隔 (秒)
+        increase_step: 速い成功1回あたりに増やすリクエストレート (回/秒)
+        decrease_factor: スロットリング1回あたりに間隔を広げる倍率
+        fast_latency_sec: 速い応答とみなすレイテンシ (秒)
+    """
+
+    def __init__(
+        self,
+        *,
+        sec: float,
+        min_sec: float,
+        max_sec: float,
+        increase_step: float = 0.02,
+        decrease_factor: float = 2.0,
+        fast_latency_sec: float = 1.0,
+    ):
+        self.interval = sec
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.fast_latency_sec = fast_latency_sec
+
+    def record(self):
+        counter.set("http", "interval_sec", self.interval)
+        counter.set("http", "rate_per_sec", 1 / self.interval)
+
+    def on_success(self, *, latency: float):
+        if latency < self.fast_latency_sec:
+            rate = 1 / self.interval + self.increase_step
+            self.interval = max(self.min_sec, 1 / rate)
+        self.record()
+
+    def on_throttle(self, *, retry_after: Optional[float]):
+        self.interval = min(self.max_sec, self.interval * self.decrease_factor)
+        if retry_after is not None:
+            self.interval = min(self.max_sec, max(self.interval, retry_after))
+        counter.add("http", "backoffs")
+        self.record()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """`Retry-After` ヘッダーの値 (秒数またはHTTP-date) を待機秒数に変換する"""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max((dt - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+def calc_backoff(
+    *, attempt: int, retry_after: Optional[float], base_sec: float, cap_sec: float
+) -> float:
+    """Full Jitterの指数バックオフで待機秒数を計算する (`Retry-After` があればそれ以上待つ)"""
+    backoff = uniform(0, min(cap_sec, base_sec * 2**attempt))
+    return backoff if retry_after is None else max(backoff, retry_after)
@@ -0,0 +1,168 @@
+import asyncio
+from http.client import HTTPMessage
+from io import BufferedReader, BytesIO
+from time import monotonic, perf_counter
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
+
+from luciferous_devio_index.common.logger import (
+    CounterBorg,
+    InvocationContextBorg,
+    MyLogger,
+)
+from luciferous_devio_index.common.rate_limiter import TokenBucketRateLimiter
+
+from .adaptive import AdaptiveInterval, calc_backoff, parse_retry_after
+from .http import RETRY_STATUSES, NotModified
+from .pool import ConnectionPool, default_pool
+from .validator_store import ValidatorStore
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+
+class FetchedResponse(object):
+    """ボディを読み込み済みのレスポンス
+
+    `PooledResponse` と同様に `read()` / `peek()` / `headers` を持つ。
+    """
+
+    def __init__(self, *, url: str, status: int, headers: HTTPMessage, body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.fp = BufferedReader(BytesIO(body))
+
+    def read(self, amt: Optional[int] = -1) -> bytes:
+        return self.fp.read(amt)
+
+    def peek(self, n: int = 1) -> bytes:
+        return self.fp.peek(n)
+
+    def readable(self) -> bool:
+        return True
+
+
+def create_async_http_client(
+    sec: float,
+    pool: ConnectionPool = default_pool,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    *,
+    min_sec: Optional[float] = None,
+    max_sec: float = 60,
+    max_concurrency_per_host: int = 4,
+    max_attempts: int = 5,
+    backoff_base_sec: float = 1,
+    time_budget_margin_sec: float = 10,
+    adaptive: Optional[AdaptiveInterval] = None,
+) -> Callable[..., Awaitable[Union[FetchedResponse, NotModified]]]:
+    """`create_http_client` の非同期版を作成する
+
+    リクエストの開始時刻はリクエスト間隔のタイムライン上に順番に割り当て、転送は重ねて実行する。
+    同じホストへの同時転送数は `max_concurrency_per_host` までに制限する。
+    ブロッキングする転送はスレッドで実行し、ボディは読み込み済みの `FetchedResponse` として返す。
+    """
+    if adaptive is None:
+        adaptive = AdaptiveInterval(
+            sec=sec, min_sec=sec if min_sec is None else min_sec, max_sec=max_sec
+        )
+    next_start: Optional[float] = None
+    semaphores: WeakKeyDictionary = WeakKeyDictionary()
+
+    def get_semaphore(host: str) -> asyncio.Semaphore:
+        # Semaphoreはイベントループごとに作成する (asyncio.runのたびにループが変わるため)
+        loop = asyncio.get_running_loop()
+        map_host: Dict[str, asyncio.Semaphore] = semaphores.setdefault(loop, {})
+        if host not in map_host:
+            map_host[host] = asyncio.Semaphore(max_concurrency_per_host)
+        return map_host[host]
+
+    async def wait_slot():
+        nonlocal next_start
+        now = monotonic()
+        start = now if next_start is None else max(now, next_start)
+        next_start = start + adaptive.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def is_within_budget(wait: float) -> bool:
+        remaining = InvocationContextBorg().get_remaining_sec()
+        return remaining is None or wait < remaining - time_budget_margin_sec
+
+    def fetch(url: str, headers: Dict[str, str]) -> FetchedResponse:
+        resp = pool.request(url, headers=headers)
+        return FetchedResponse(
+            url=url, status=resp.status, headers=resp.headers, body=resp.read()
+        )
+
+    async def process(
+        url: str, *, validator_store: Optional[ValidatorStore] = None
+    ) -> Union[FetchedResponse, NotModified]:
+        loop = asyncio.get_running_loop()
+        host = urlsplit(url).hostname
+        validator = None if validator_store is None else validator_store.get(url)
+        headers = {} if validator is None else validator.to_headers()
+
+        attempt = 0
+        while True:
+            await wait_slot()
+            if rate_limiter is not None:
+                await loop.run_in_executor(None, rate_limiter.acquire, host)
+
+            async with get_semaphore(host):
+                before = perf_counter()
+                try:
+                    resp = await loop.run_in_executor(None, fetch, url, headers)
+                except HTTPError as e:
+                    if e.code == 304 and validator is not None:
+                        adaptive.on_success(latency=perf_counter() - before)
+                        return NotModified(url=url, validator=validator)
+                    if e.code not in RETRY_STATUSES:
+                        raise
+                    retry_after = parse_retry_after(e.headers.get("Retry-After"))
+                    adaptive.on_throttle(retry_after=retry_after)
+                    attempt += 1
+                    backoff = calc_backoff(
+                        attempt=attempt,
+                        retry_after=retry_after,
+                        base_sec=backoff_base_sec,
+                        cap_sec=max_sec,
+                    )
+                    if attempt >= max_attempts or not is_within_budget(backoff):
+                        raise
+                    logger.warning(
+                        f"retry request: status={e.code}, attempt={attempt}, backoff={backoff}",
+                        url=url,
+                        interval=adaptive.interval,
+                    )
+                    counter.add("http", "retries")
+                else:
+                    adaptive.on_success(latency=perf_counter() - before)
+                    return resp
+            await asyncio.sleep(backoff)
+
+    return process
+
+
+@logger.logging_function(with_return=False)
+def fetch_all(
+    *,
+    urls: List[str],
+    client: Callable[..., Awaitable[Union[FetchedResponse, NotModified]]],
+) -> List[Union[FetchedResponse, NotModified, Exception]]:
+    """非同期クライアントで複数のURLを並行して取得する
+
+    Args:
+        urls: 取得するURL
+        client: `create_async_http_client` で作成したクライアント
+
+    Returns:
+        URLと同じ順序のレスポンス (失敗したURLは例外)
+    """
+
+    async def main():
+        return await asyncio.gather(*[client(x) for x in urls], return_exceptions=True)
+
+    return asyncio.run(main())
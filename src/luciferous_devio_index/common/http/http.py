@@ -1,28 +1,129 @@
+from dataclasses import dataclass
 from datetime import datetime
-from http.client import HTTPResponse
-from time import sleep
-from typing import Callable, Optional
-from urllib.request import urlopen
+from time import perf_counter, sleep
+from typing import Callable, Optional, Union
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
 
-from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.logger import (
+    CounterBorg,
+    InvocationContextBorg,
+    MyLogger,
+)
+from luciferous_devio_index.common.rate_limiter import TokenBucketRateLimiter
+
+from .adaptive import AdaptiveInterval, calc_backoff, parse_retry_after
+from .pool import ConnectionPool, PooledResponse, default_pool
+from .validator_store import Validator, ValidatorStore
 
 logger = MyLogger(__name__)
+counter = CounterBorg()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@dataclass(frozen=True)
+class NotModified:
+    url: str
+    validator: Validator
 
 
-def create_http_client(sec: int) -> Callable[[str], HTTPResponse]:
+def create_http_client(
+    sec: float,
+    pool: ConnectionPool = default_pool,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    *,
+    min_sec: Optional[float] = None,
+    max_sec: float = 60,
+    max_attempts: int = 5,
+    backoff_base_sec: float = 1,
+    time_budget_margin_sec: float = 10,
+    adaptive: Optional[AdaptiveInterval] = None,
+) -> Callable[..., Union[PooledResponse, NotModified]]:
+    """リクエスト間隔を制御するHTTPクライアントを作成する
+
+    リクエスト間隔は `sec` から始まり、`min_sec` から `max_sec` の範囲でAIMDにより調整される。
+    429と5xxはJitter付きの指数バックオフ (`Retry-After` があればそれ以上) で `max_attempts` 回まで
+    再試行するが、Lambdaの残り時間から `time_budget_margin_sec` を引いた時間を超える待機はしない。
+    `adaptive` を指定した場合は他のクライアントとリクエスト間隔の調整を共有する。
+    """
     dt_prev: Optional[datetime] = None
+    if adaptive is None:
+        adaptive = AdaptiveInterval(
+            sec=sec, min_sec=sec if min_sec is None else min_sec, max_sec=max_sec
+        )
 
-    @logger.logging_function()
-    def process(url: str) -> HTTPResponse:
-        nonlocal dt_prev
+    def wait_interval():
         if dt_prev is not None:
             delta = datetime.now() - dt_prev
-            wait = sec - delta.total_seconds()
+            wait = adaptive.interval - delta.total_seconds()
             if wait > 0:
                 sleep(wait)
 
-        resp = urlopen(url)
-        dt_prev = datetime.now()
-        return resp
+    def is_within_budget(wait: float) -> bool:
+        remaining = InvocationContextBorg().get_remaining_sec()
+        return remaining is None or wait < remaining - time_budget_margin_sec
+
+    @logger.logging_function()
+    def process(
+        url: str, *, validator_store: Optional[ValidatorStore] = None
+    ) -> Union[PooledResponse, NotModified]:
+        """URLを取得する
+
+        接続はホストごとにプールして再利用し、gzip (brotliがあればbr) で圧縮転送を要求する。
+        `rate_limiter` がある場合は実行環境をまたいだホストごとのトークンを取得してからリクエストする。
+
+        `validator_store` を指定した場合は保存済みの `ETag` / `Last-Modified` で条件付きリクエストを行い、
+        304が返された場合は `NotModified` を返す。取得した内容の処理が終わった後に
+        `save_validator` で新しい値を保存すること。
+        """
+        nonlocal dt_prev
+        validator = None if validator_store is None else validator_store.get(url)
+        headers = {} if validator is None else validator.to_headers()
+
+        attempt = 0
+        while True:
+            wait_interval()
+            if rate_limiter is not None:
+                rate_limiter.acquire(urlsplit(url).hostname)
+
+            before = perf_counter()
+            try:
+                resp = pool.request(url, headers=headers)
+            except HTTPError as e:
+                if e.code == 304 and validator is not None:
+                    adaptive.on_success(latency=perf_counter() - before)
+                    return NotModified(url=url, validator=validator)
+                if e.code not in RETRY_STATUSES:
+                    raise
+                retry_after = parse_retry_after(e.headers.get("Retry-After"))
+                adaptive.on_throttle(retry_after=retry_after)
+                attempt += 1
+                backoff = calc_backoff(
+                    attempt=attempt,
+                    retry_after=retry_after,
+                    base_sec=backoff_base_sec,
+                    cap_sec=max_sec,
+                )
+                if attempt >= max_attempts or not is_within_budget(backoff):
+                    raise
+                logger.warning(
+                    f"retry request: status={e.code}, attempt={attempt}, backoff={backoff}",
+                    url=url,
+                    interval=adaptive.interval,
+                )
+                counter.add("http", "retries")
+                sleep(backoff)
+                continue
+            finally:
+                dt_prev = datetime.now()
+            adaptive.on_success(latency=perf_counter() - before)
+            return resp
 
     return process
+
+
+@logger.logging_function(with_arg=False)
+def save_validator(*, url: str, resp: PooledResponse, validator_store: ValidatorStore):
+    if (validator := Validator.from_headers(resp.headers)) is not None:
+        validator_store.put(url, validator)
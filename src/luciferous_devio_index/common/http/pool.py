@@ -0,0 +1,223 @@
+import zlib
+from http.client import (
+    HTTPConnection,
+    HTTPException,
+    HTTPMessage,
+    HTTPResponse,
+    HTTPSConnection,
+)
+from io import BytesIO
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from luciferous_devio_index.common.logger import CounterBorg
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING = "gzip" if brotli is None else "br, gzip"
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 10
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+USER_AGENT = "luciferous-devio-index"
+
+counter = CounterBorg()
+
+
+class PooledResponse(object):
+    """プールされた接続からのレスポンス
+
+    `HTTPResponse` と同様に `read()` できるが、`Content-Encoding` に応じて展開しながら読み込む。
+    ボディを最後まで読み込んだ時点で接続をプールへ返却する。
+    """
+
+    def __init__(
+        self,
+        *,
+        url: str,
+        raw: HTTPResponse,
+        release: Callable[[], None],
+        close: Callable[[], None],
+    ):
+        self.url = url
+        self.group = f"http:{urlsplit(url).hostname}"
+        self.raw = raw
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers: HTTPMessage = raw.headers
+        self.release = release
+        self.close_connection = close
+        self.buffer = bytearray()
+        self.eof = False
+
+        encoding = (raw.getheader("Content-Encoding") or "").strip().lower()
+        self.decompress: Optional[Callable[[bytes], bytes]] = None
+        self.flush: Optional[Callable[[], bytes]] = None
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.decompress = decompressor.decompress
+            self.flush = decompressor.flush
+        elif encoding == "br" and brotli is not None:
+            self.decompress = brotli.Decompressor().process
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.headers.get(name, default)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def readable(self) -> bool:
+        return True
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        try:
+            raw = self.raw.read(CHUNK_SIZE)
+        except Exception:
+            self.eof = True
+            self.close_connection()
+            raise
+        if not raw:
+            self.eof = True
+            if self.flush is not None:
+                self.buffer += self.flush()
+            self.release()
+            return False
+
+        data = raw if self.decompress is None else self.decompress(raw)
+        for group in ("http", self.group):
+            counter.add(group, "bytes_on_wire", len(raw))
+            counter.add(group, "bytes_decoded", len(data))
+        self.buffer += data
+        return True
+
+    def read(self, amt: Optional[int] = -1) -> bytes:
+        if amt is None or amt < 0:
+            while self.fill():
+                pass
+            amt = len(self.buffer)
+        else:
+            while len(self.buffer) < amt and self.fill():
+                pass
+        data = bytes(self.buffer[:amt])
+        del self.buffer[:amt]
+        return data
+
+    def peek(self, n: int = 1) -> bytes:
+        while len(self.buffer) < n and self.fill():
+            pass
+        return bytes(self.buffer)
+
+    def close(self):
+        if not self.eof:
+            self.eof = True
+            self.close_connection()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConnectionPool(object):
+    """ホストごとに持続的接続を保持するコネクションプール"""
+
+    def __init__(self, *, max_idle_per_host: int = 4, timeout: float = 30):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.idle: Dict[Tuple[str, str, int], List[HTTPConnection]] = {}
+        self.lock = Lock()
+
+    def acquire(self, key: Tuple[str, str, int]) -> Tuple[HTTPConnection, bool]:
+        with self.lock:
+            connections = self.idle.get(key, [])
+            if connections:
+                return connections.pop(), True
+        scheme, host, port = key
+        cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def release(self, key: Tuple[str, str, int], conn: HTTPConnection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle_per_host:
+                connections.append(conn)
+                return
+        conn.close()
+
+    def send(
+        self, *, url: str, headers: Dict[str, str]
+    ) -> Tuple[Tuple[str, str, int], HTTPConnection, HTTPResponse]:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        headers = {
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "User-Agent": USER_AGENT,
+            **headers,
+        }
+
+        while True:
+            conn, reused = self.acquire(key)
+            try:
+                conn.request("GET", path, headers=headers)
+                raw = conn.getresponse()
+            except (HTTPException, ConnectionError):
+                conn.close()
+                if reused:
+                    # 保持していた接続がサーバー側で切断されていた場合は新しい接続で再試行する
+                    continue
+                raise
+            for group in ("http", f"http:{parts.hostname}"):
+                counter.add(group, "requests")
+                counter.add(
+                    group, "connections_reused" if reused else "connections_created"
+                )
+            return key, conn, raw
+
+    def request(
+        self, url: str, *, headers: Optional[Dict[str, str]] = None
+    ) -> PooledResponse:
+        """URLをGETする
+
+        リダイレクトは追従し、300以上のステータスは `urlopen` と同様に `HTTPError` を送出する。
+
+        Args:
+            url: 取得するURL
+            headers: 追加のリクエストヘッダー
+
+        Returns:
+            レスポンス
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            key, conn, raw = self.send(url=url, headers=headers or {})
+
+            def release(key=key, conn=conn, raw=raw):
+                if raw.will_close:
+                    conn.close()
+                else:
+                    self.release(key, conn)
+
+            resp = PooledResponse(url=url, raw=raw, release=release, close=conn.close)
+            if raw.status < 300:
+                return resp
+
+            body = resp.read()
+            location = resp.getheader("Location")
+            if raw.status in REDIRECT_STATUSES and location is not None:
+                url = urljoin(url, location)
+                continue
+            raise HTTPError(url, raw.status, raw.reason, raw.headers, BytesIO(body))
+        raise HTTPError(url, raw.status, "too many redirects", raw.headers, None)
+
+
+default_pool = ConnectionPool()
@@ -0,0 +1,157 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from hashlib import sha256
+from http.client import HTTPMessage
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from luciferous_devio_index.common.aws import create_client, create_resource
+from luciferous_devio_index.common.logger import MyLogger
+
+logger = MyLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Validator:
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    @classmethod
+    def from_headers(cls, headers: HTTPMessage) -> Optional["Validator"]:
+        validator = cls(
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        if validator.etag is None and validator.last_modified is None:
+            return None
+        return validator
+
+    def to_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ValidatorStore(ABC):
+    """URLごとの `ETag` / `Last-Modified` を保存するストアの基底クラス"""
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[Validator]:
+        pass
+
+    @abstractmethod
+    def put(self, url: str, validator: Validator):
+        pass
+
+
+class MemoryValidatorStore(ValidatorStore):
+    """プロセス内に保存するストア (ウォームスタートしたコンテナの間だけ有効)"""
+
+    def __init__(self):
+        self.validators: Dict[str, Validator] = {}
+
+    def get(self, url: str) -> Optional[Validator]:
+        return self.validators.get(url)
+
+    def put(self, url: str, validator: Validator):
+        self.validators[url] = validator
+
+
+class FileValidatorStore(ValidatorStore):
+    """`/tmp` などのディレクトリにURLごとのJSONファイルとして保存するストア"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def create_path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{sha256(url.encode()).hexdigest()}.json")
+
+    def get(self, url: str) -> Optional[Validator]:
+        try:
+            with open(self.create_path(url)) as f:
+                return Validator(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def put(self, url: str, validator: Validator):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.create_path(url), "w") as f:
+            json.dump(asdict(validator), f)
+
+
+class S3ValidatorStore(ValidatorStore):
+    """S3のオブジェクトとしてURLごとに保存するストア"""
+
+    def __init__(self, bucket: str, prefix: str):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3_client = create_client("s3")
+
+    def create_key(self, url: str) -> str:
+        name = f"{sha256(url.encode()).hexdigest()}.json"
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def get(self, url: str) -> Optional[Validator]:
+        try:
+            resp = self.s3_client.get_object(
+                Bucket=self.bucket, Key=self.create_key(url)
+            )
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return Validator(**json.load(resp["Body"]))
+
+    def put(self, url: str, validator: Validator):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.create_key(url),
+            ContentType="application/json",
+            Body=json.dumps(asdict(validator)).encode(),
+        )
+
+
+class DynamoDbValidatorStore(ValidatorStore):
+    """ハッシュキーが `url` のDynamoDBテーブルに保存するストア"""
+
+    def __init__(self, table_name: str):
+        self.table = create_resource("dynamodb").Table(table_name)
+
+    def get(self, url: str) -> Optional[Validator]:
+        item = self.table.get_item(Key={"url": url}).get("Item")
+        if item is None:
+            return None
+        return Validator(etag=item.get("etag"), last_modified=item.get("last_modified"))
+
+    def put(self, url: str, validator: Validator):
+        self.table.put_item(Item={"url": url, **asdict(validator)})
+
+
+@lru_cache(maxsize=None)
+@logger.logging_function()
+def create_validator_store(uri: str) -> ValidatorStore:
+    """URI形式の指定からストアを作成する
+
+    同じURIに対しては同じインスタンスを返すため、インメモリのストアはウォームスタート間で共有される。
+
+    Args:
+        uri: `memory`, `file:///tmp/http-validators`, `s3://bucket/prefix`, `dynamodb://table` のいずれか
+
+    Returns:
+        ストア
+    """
+    parsed = urlparse(uri)
+    if parsed.scheme == "" and parsed.path == "memory":
+        return MemoryValidatorStore()
+    elif parsed.scheme == "file":
+        return FileValidatorStore(directory=parsed.path)
+    elif parsed.scheme == "s3":
+        return S3ValidatorStore(bucket=parsed.netloc, prefix=parsed.path.strip("/"))
+    elif parsed.scheme == "dynamodb":
+        return DynamoDbValidatorStore(table_name=parsed.netloc)
+    else:
+        raise ValueError(f"invalid validator store: {uri}")
@@ -1 +1 @@
-from .subpage_index import TEMPLATE_SUBPAGE_INDEX
+from .subpage_index import TEMPLATE_SUBPAGE_INDEX, TEMPLATE_SUBPAGE_INDEX_PAGE
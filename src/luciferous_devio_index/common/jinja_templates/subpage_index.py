@@ -20,6 +20,58 @@ TEMPLATE_SUBPAGE_INDEX = """
 </head>
 <body>
 <h2>Index of /{{ path }}</h2>
+<table>
+    <thead>
+    <tr>
+        <th>page</th>
+        <th>first</th>
+        <th>last</th>
+        <th>count</th>
+    </tr>
+    </thead>
+    <tbody>
+    <tr>
+        <td><a href="..">../</a></td>
+        <td></td>
+        <td></td>
+        <td></td>
+    </tr>
+    {% for page in pages %}
+    <tr>
+        <td><a href="{{ page.get_name() }}">{{ page.get_name() }}</a></td>
+        <td>{{ page.contents[0].name }}</td>
+        <td>{{ page.contents[-1].name }}</td>
+        <td>{{ page.contents | length }}</td>
+    </tr>
+    {% endfor %}
+    </tbody>
+</table>
+</body>
+</html>
+"""
+
+TEMPLATE_SUBPAGE_INDEX_PAGE = """
+<!DOCTYPE html>
+<html lang="ja-jp">
+<head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width" />
+    <title>Index of /{{ path }} ({{ page.number }})</title>
+    <style>
+        th {
+            border-bottom: 1px solid black;
+        }
+        th, td {
+            padding-left: 1rem;
+            padding-right: 1rem;
+        }
+        table {
+            border-collapse: collapse;
+        }
+    </style>
+</head>
+<body>
+<h2>Index of /{{ path }} ({{ page.number }})</h2>
 <table>
     <thead>
     <tr>
@@ -30,11 +82,11 @@ TEMPLATE_SUBPAGE_INDEX = """
     </thead>
     <tbody>
     <tr>
-        <td><a href="..">../</a></td>
+        <td><a href="index.html">../</a></td>
         <td></td>
         <td></td>
     </tr>
-    {% for item in contents %}
+    {% for item in page.contents %}
     <tr>
         <td><a href="{{ item.name }}">{{item.name}}</a></td>
         <td>{{ item.last_modified_at }}</td>
@@ -1 +1,4 @@
+from .counter_borg import CounterBorg
+from .emf import create_emf_records, emit_emf_records
+from .invocation_context_borg import InvocationContextBorg
 from .my_logger import LambdaContextDummy, MyLogger
@@ -0,0 +1,32 @@
+from threading import Lock
+
+
+class CounterBorg(object):
+    _shared_state = {}
+    # botocoreのフックやrun_in_executorのスレッドからも加算されるため、読み書きをロックで保護する
+    _lock = Lock()
+
+    def __new__(cls):
+        ob = super().__new__(cls)
+        ob.__dict__ = cls._shared_state
+        return ob
+
+    def add(self, group: str, name: str, value: float = 1):
+        with self._lock:
+            map_group: dict = self._shared_state.setdefault(group, {})
+            map_group[name] = map_group.get(name, 0) + value
+
+    def set(self, group: str, name: str, value: float):
+        with self._lock:
+            self._shared_state.setdefault(group, {})[name] = value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                group: dict(map_group)
+                for group, map_group in self._shared_state.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._shared_state.clear()
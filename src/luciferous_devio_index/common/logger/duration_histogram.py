@@ -0,0 +1,106 @@
+from math import ceil, log
+from typing import List, Tuple
+
+# 1ナノ秒を下限として、相対誤差が約1%になる対数スケールのバケットに分ける
+MIN_VALUE = 1e-9
+LOG_MIN_VALUE = log(MIN_VALUE)
+INVERSE_LOG_BASE = 1 / log(1.02)
+
+
+class DurationHistogram(object):
+    """HDR Histogram風の対数スケールのヒストグラム
+
+    バケット数は値の範囲の対数に比例するため、記録した件数に関係なくメモリ使用量は一定に収まる。
+    パーセンタイルは相対誤差約1%で近似する。
+    `calls` は実行時間を計測しなかった (サンプリングで外れた) 呼び出しも含む呼び出し回数で、
+    `count` は実行時間を記録した回数。
+    """
+
+    __slots__ = ("calls", "count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = {}
+
+    def add_call(self):
+        self.calls += 1
+
+    def add(self, value: float):
+        self.calls += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        index = (
+            int((log(value) - LOG_MIN_VALUE) * INVERSE_LOG_BASE)
+            if value > MIN_VALUE
+            else 0
+        )
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "DurationHistogram"):
+        self.calls += other.calls
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def copy(self) -> "DurationHistogram":
+        histogram = DurationHistogram()
+        histogram.merge(self)
+        return histogram
+
+    def get_bucket_value(self, index: int) -> float:
+        # バケットの幾何平均を代表値とし、実測の最小値・最大値の範囲に収める
+        value = MIN_VALUE * 1.02 ** (index + 0.5)
+        return min(max(value, self.min), self.max)
+
+    def get_distribution(self, max_values: int) -> List[Tuple[float, int]]:
+        """バケットの代表値と件数の組を値の小さい順に返す
+
+        バケットが `max_values` より多い場合は、隣り合うバケットを件数で重み付けした平均の値にまとめる。
+        """
+        indexes = sorted(self.buckets)
+        size = ceil(len(indexes) / max_values) if indexes else 1
+        result = []
+        for i in range(0, len(indexes), size):
+            group = indexes[i : i + size]
+            count = sum(self.buckets[x] for x in group)
+            value = sum(self.get_bucket_value(x) * self.buckets[x] for x in group)
+            result.append((value / count, count))
+        return result
+
+    def percentile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.get_bucket_value(index)
+        return self.max
+
+    def get_stats(self) -> dict:
+        """呼び出し回数と実行時間の統計を返す
+
+        実行時間を1回も記録していない場合は、呼び出し回数だけを返す。
+        """
+        if self.count == 0:
+            return {"len": self.calls, "sampled": 0}
+        return {
+            "len": self.calls,
+            "sampled": self.count,
+            "max": self.max,
+            "min": self.min,
+            "avg": self.total / self.count,
+            "med": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+        }
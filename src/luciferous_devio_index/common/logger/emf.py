@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import time
+from typing import List, Optional, Set
+
+ENVIRONMENT_NAME_EMF_NAMESPACE = "EMF_NAMESPACE"
+ENVIRONMENT_NAME_EMF_FUNCTIONS = "EMF_FUNCTIONS"
+DEFAULT_EMF_NAMESPACE = "LuciferousDevioIndex"
+
+# EMFの1つのメトリクスに載せられる値の数の上限
+MAX_DISTRIBUTION_VALUES = 100
+
+
+def parse_targets(value: Optional[str]) -> Set[str]:
+    """`EMF_FUNCTIONS` の値 (カンマ区切りの `関数名` / `ロガー名:関数名` / `*`) を解釈する"""
+    if value is None:
+        return set()
+    return {x.strip() for x in value.split(",") if x.strip()}
+
+
+def is_target(*, targets: Set[str], logger_name: str, function_name: str) -> bool:
+    return (
+        "*" in targets
+        or function_name in targets
+        or f"{logger_name}:{function_name}" in targets
+    )
+
+
+def create_emf_records(
+    *,
+    namespace: str,
+    handler_name: str,
+    histograms: dict,
+    targets: Set[str],
+    timestamp: Optional[int] = None,
+) -> List[dict]:
+    """関数の実行時間のヒストグラムからCloudWatch Embedded Metric Formatのレコードを作成する
+
+    実行時間は実行ごとのパーセンタイルではなく、ヒストグラムの値と件数 (`Values` / `Counts`) を
+    `Duration` メトリクスとして送る。CloudWatchが複数の実行をまとめたパーセンタイルを計算できるようにするため。
+
+    Args:
+        namespace: メトリクスの名前空間
+        handler_name: ハンドラーのロガー名 (Handlerディメンション)
+        histograms: `FunctionDurationStatsBorg.get_histograms` の返り値
+        targets: 対象とする関数
+        timestamp: レコードのタイムスタンプ (UNIXエポックのミリ秒)
+
+    Returns:
+        EMFのレコード
+    """
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    result = []
+    for logger_name, map_function in histograms.items():
+        for function_name, histogram in map_function.items():
+            if not is_target(
+                targets=targets, logger_name=logger_name, function_name=function_name
+            ):
+                continue
+            metrics = [{"Name": "Calls", "Unit": "Count"}]
+            record = {
+                "Handler": handler_name,
+                "Logger": logger_name,
+                "Function": function_name,
+                "Calls": histogram.calls,
+            }
+            # サンプリングで実行時間を1回も計測しなかった場合は呼び出し回数だけを送る
+            if histogram.count > 0:
+                distribution = histogram.get_distribution(MAX_DISTRIBUTION_VALUES)
+                metrics.append({"Name": "Duration", "Unit": "Seconds"})
+                record["Duration"] = {
+                    "Values": [x[0] for x in distribution],
+                    "Counts": [x[1] for x in distribution],
+                }
+            record["_aws"] = {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": namespace,
+                        "Dimensions": [["Handler", "Logger", "Function"]],
+                        "Metrics": metrics,
+                    }
+                ],
+            }
+            result.append(record)
+    return result
+
+
+def emit_emf_records(*, handler_name: str, histograms: dict):
+    """環境変数の設定に従ってEMFのレコードを標準出力に1行ずつ書き出す"""
+    targets = parse_targets(os.environ.get(ENVIRONMENT_NAME_EMF_FUNCTIONS))
+    if len(targets) == 0:
+        return
+    for record in create_emf_records(
+        namespace=os.environ.get(ENVIRONMENT_NAME_EMF_NAMESPACE, DEFAULT_EMF_NAMESPACE),
+        handler_name=handler_name,
+        histograms=histograms,
+        targets=targets,
+    ):
+        sys.stdout.write(json.dumps(record) + "\n")
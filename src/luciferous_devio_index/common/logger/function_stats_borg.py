@@ -1,32 +1,69 @@
-import statistics
+from .duration_histogram import DurationHistogram
 
 
 class FunctionDurationStatsBorg(object):
-    _shared_state = {}
+    """ロガー・関数ごとの実行時間の統計
+
+    現在の実行 (invocation) とコンテナの起動から (lifetime) の2つの範囲の統計を返す。
+    記録は現在の実行のヒストグラムにだけ行い、`reset_invocation` でLambdaの実行の区切りごとに
+    起動からのヒストグラムへ統合する。
+    """
+
+    _shared_state = {"invocation": {}, "lifetime": {}}
 
     def __new__(cls):
         ob = super().__new__(cls)
         ob.__dict__ = cls._shared_state
         return ob
 
+    def get_histogram(self, logger_name: str, function_name: str) -> DurationHistogram:
+        map_logger: dict = self._shared_state["invocation"].setdefault(logger_name, {})
+        histogram = map_logger.get(function_name)
+        if histogram is None:
+            histogram = map_logger[function_name] = DurationHistogram()
+        return histogram
+
     def append(self, logger_name: str, function_name: str, duration: float):
-        map_logger: dict = self._shared_state.get(logger_name, {})
-        list_function: list = map_logger.get(function_name, [])
-        list_function.append(duration)
-        map_logger[function_name] = list_function
-        self._shared_state[logger_name] = map_logger
+        self.get_histogram(logger_name, function_name).add(duration)
 
-    def get_stats(self) -> dict:
+    def append_call(self, logger_name: str, function_name: str):
+        """実行時間を計測しなかった呼び出しを、呼び出し回数にだけ数える"""
+        self.get_histogram(logger_name, function_name).add_call()
+
+    def get_histograms(self, lifetime: bool) -> dict:
+        if not lifetime:
+            return self._shared_state["invocation"]
+        result = {
+            logger_name: {
+                function_name: histogram.copy()
+                for function_name, histogram in map_logger.items()
+            }
+            for logger_name, map_logger in self._shared_state["lifetime"].items()
+        }
+        merge_histograms(result, self._shared_state["invocation"])
+        return result
+
+    def get_stats(self, lifetime: bool = False) -> dict:
         return {
             logger_name: {
-                function_name: {
-                    "len": len(list_function),
-                    "max": max(list_function),
-                    "min": min(list_function),
-                    "avg": statistics.mean(list_function),
-                    "med": statistics.median(list_function),
-                }
-                for function_name, list_function in map_logger.items()
+                function_name: histogram.get_stats()
+                for function_name, histogram in map_logger.items()
             }
-            for logger_name, map_logger in self._shared_state.items()
+            for logger_name, map_logger in self.get_histograms(lifetime).items()
         }
+
+    def reset_invocation(self):
+        merge_histograms(
+            self._shared_state["lifetime"], self._shared_state["invocation"]
+        )
+        self._shared_state["invocation"] = {}
+
+
+def merge_histograms(target: dict, source: dict):
+    for logger_name, map_logger in source.items():
+        map_target: dict = target.setdefault(logger_name, {})
+        for function_name, histogram in map_logger.items():
+            if function_name in map_target:
+                map_target[function_name].merge(histogram)
+            else:
+                map_target[function_name] = histogram.copy()
@@ -0,0 +1,20 @@
+from typing import Optional
+
+
+class InvocationContextBorg(object):
+    _shared_state = {}
+
+    def __new__(cls):
+        ob = super().__new__(cls)
+        ob.__dict__ = cls._shared_state
+        return ob
+
+    def set_context(self, context):
+        self._shared_state["context"] = context
+
+    def get_remaining_sec(self) -> Optional[float]:
+        """実行中のLambdaの残り時間 (秒) を返す (Lambdaの外や取得できない場合はNone)"""
+        context = self._shared_state.get("context")
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return None
+        return context.get_remaining_time_in_millis() / 1000
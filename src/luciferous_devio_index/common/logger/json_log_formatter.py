@@ -2,13 +2,12 @@ import dataclasses
 import json
 import logging
 import os
+import sys
 from collections import UserList
 from decimal import Decimal
 from enum import Enum
 from typing import Type
 
-from boto3.dynamodb.conditions import AttributeBase, ConditionBase
-
 LAMBDA_REQUEST_ID_ENVIRONMENT_VALUE_NAME = "LAMBDA_REQUEST_ID"
 
 
@@ -19,14 +18,17 @@ def default(obj):
         return str(obj)
     elif isinstance(obj, (set, UserList)):
         return list(obj)
-    elif isinstance(obj, ConditionBase):
-        return obj.get_expression()
-    elif isinstance(obj, AttributeBase):
-        return obj.name
     elif isinstance(obj, Enum):
         return obj.value
     elif dataclasses.is_dataclass(obj):
         return dataclasses.asdict(obj)
+    # 条件式を使っていればboto3.dynamodb.conditionsはimport済みなので、ここでimportはしない
+    conditions = sys.modules.get("boto3.dynamodb.conditions")
+    if conditions is not None:
+        if isinstance(obj, conditions.ConditionBase):
+            return obj.get_expression()
+        elif isinstance(obj, conditions.AttributeBase):
+            return obj.name
     try:
         return {"type": str(type(obj)), "value": str(obj)}
     except Exception:
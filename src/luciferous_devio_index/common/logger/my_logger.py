@@ -1,16 +1,21 @@
 import os
 import sys
-from datetime import datetime
-from functools import wraps
+from datetime import timedelta
+from functools import lru_cache, wraps
+from importlib.metadata import version
+from itertools import count
 from logging import DEBUG
-from typing import Callable
+from random import random
+from time import perf_counter_ns
+from typing import Callable, Optional
 from uuid import uuid4
 
-import boto3
-import botocore
 from aws_lambda_powertools import Logger
 
+from .counter_borg import CounterBorg
+from .emf import emit_emf_records
 from .function_stats_borg import FunctionDurationStatsBorg
+from .invocation_context_borg import InvocationContextBorg
 from .json_log_formatter import LAMBDA_REQUEST_ID_ENVIRONMENT_VALUE_NAME, default
 
 ENVIRONMENT_VARIABLES_NOT_LOGGING = [
@@ -27,13 +32,39 @@ ENVIRONMENT_VARIABLES_NOT_LOGGING = [
     "AWS_XRAY_DAEMON_ADDRESS",
 ]
 
+ENVIRONMENT_NAME_DISABLE_TIMING = "LOGGING_FUNCTION_DISABLE_TIMING"
+
+# func_idはプロセスごとのプレフィックスと連番で作成する (呼び出しごとのuuid4を避けるため)
+FUNC_ID_PREFIX = uuid4().hex[:12]
+FUNC_ID_COUNTER = count(1)
+
 sys.stdout.reconfigure(line_buffering=True)
 sys.stderr.reconfigure(line_buffering=True)
 
 
+def create_func_id() -> str:
+    return f"{FUNC_ID_PREFIX}-{next(FUNC_ID_COUNTER)}"
+
+
+def is_timing_enabled() -> bool:
+    return os.environ.get(ENVIRONMENT_NAME_DISABLE_TIMING, "").lower() not in [
+        "1",
+        "true",
+    ]
+
+
+@lru_cache(maxsize=1)
+def get_package_versions() -> dict:
+    # boto3自体をimportするとコールドスタートが遅くなるので、パッケージのメタデータから取得する
+    return {"boto3": version("boto3"), "botocore": version("botocore")}
+
+
 class LambdaContextDummy(object):
     aws_request_id: str
 
+    def get_remaining_time_in_millis(self) -> int:
+        ...
+
 
 class MyLogger(object):
     """ログのJSON整形などを設定したロガー
@@ -44,6 +75,7 @@ class MyLogger(object):
     name: str
     logger: Logger
     measure: FunctionDurationStatsBorg
+    counter: CounterBorg
 
     def __init__(self, name: str):
         self.name = name
@@ -54,6 +86,7 @@ class MyLogger(object):
             use_rfc3339=True,
         )
         self.measure = FunctionDurationStatsBorg()
+        self.counter = CounterBorg()
 
     def debug(self, msg, *args, exc_info: bool = False, **kwargs) -> None:
         self.logger.debug(
@@ -75,54 +108,119 @@ class MyLogger(object):
             msg, *args, exc_info=exc_info, extra={"additional_data": kwargs}
         )
 
+    def log_function_end(
+        self,
+        *,
+        func_id: str,
+        name: str,
+        duration_ns: Optional[int],
+        is_succeed: bool,
+        result,
+        args: tuple,
+        kwargs: dict,
+        with_return: bool,
+    ):
+        delta = (
+            None if duration_ns is None else timedelta(microseconds=duration_ns / 1000)
+        )
+        status = "success" if is_succeed else "failed"
+        end_kwargs = {
+            "func_id": func_id,
+            "function_name": name,
+            "duration": None if delta is None else str(delta),
+            "duration_sec": None if duration_ns is None else duration_ns / 1e9,
+            "is_succeed": is_succeed,
+        }
+        if with_return and is_succeed:
+            end_kwargs["return"] = result
+        if not is_succeed:
+            end_kwargs["args"] = args
+            end_kwargs["kwargs"] = kwargs
+        self.debug(
+            f"function {name} end ({status}) ({func_id}) (Duration: {delta})",
+            **end_kwargs,
+        )
+
     def logging_function(
-        self, with_arg: bool = True, with_return: bool = True, write_log: bool = False
+        self,
+        with_arg: bool = True,
+        with_return: bool = True,
+        write_log: bool = False,
+        sample_rate: float = 1.0,
     ) -> Callable:
+        """関数の実行時間の計測とロギングを行うデコレーター
+
+        ログのペイロードはログを出力する場合 (`write_log` または失敗時) にだけ作成する。
+        環境変数 `LOGGING_FUNCTION_DISABLE_TIMING` を `true` にすると実行時間を計測しない。
+
+        Args:
+            with_arg: 開始のログに引数を含めるかどうか
+            with_return: 終了のログに返り値を含めるかどうか
+            write_log: 成功時にも開始と終了のログを出力するかどうか
+            sample_rate: 実行時間を計測する呼び出しの割合 (小さな関数を高頻度で呼び出す場合に下げる)
+                計測しなかった呼び出しも呼び出し回数には数える
+
+        Returns:
+            関数の実行時間の計測とロギングを行う関数
+        """
+
         def wrapper(func):
+            name = func.__name__
+            timing = is_timing_enabled()
+            sampling = sample_rate < 1.0
+
             @wraps(func)
             def process(*args, **kwargs):
-                func_id = str(uuid4())
-                name = func.__name__
-
-                start_kwargs = {"func_id": func_id, "function_name": name}
-                if with_arg:
-                    start_kwargs["args"] = args
-                    start_kwargs["kwargs"] = kwargs
-                before = datetime.now()
+                measured = timing and (not sampling or random() < sample_rate)
+                func_id = None
                 if write_log:
+                    func_id = create_func_id()
+                    start_kwargs = {"func_id": func_id, "function_name": name}
+                    if with_arg:
+                        start_kwargs["args"] = args
+                        start_kwargs["kwargs"] = kwargs
                     self.debug(f"function {name} start ({func_id})", **start_kwargs)
 
-                result = None
-                is_succeed = True
+                before = perf_counter_ns() if measured else 0
                 try:
                     result = func(*args, **kwargs)
-                    return result
                 except Exception:
-                    is_succeed = False
+                    duration_ns = None
+                    if measured:
+                        duration_ns = perf_counter_ns() - before
+                        self.measure.append(self.name, name, duration_ns / 1e9)
+                    elif timing:
+                        self.measure.append_call(self.name, name)
+                    self.log_function_end(
+                        func_id=func_id or create_func_id(),
+                        name=name,
+                        duration_ns=duration_ns,
+                        is_succeed=False,
+                        result=None,
+                        args=args,
+                        kwargs=kwargs,
+                        with_return=with_return,
+                    )
                     raise
-                finally:
-                    after = datetime.now()
-                    delta = after - before
-                    self.measure.append(self.name, name, delta.total_seconds())
-
-                    status = "success" if is_succeed else "failed"
-                    end_kwargs = {
-                        "func_id": func_id,
-                        "function_name": name,
-                        "duration": str(delta),
-                        "duration_sec": delta.total_seconds(),
-                        "is_succeed": is_succeed,
-                    }
-                    if with_return and is_succeed:
-                        end_kwargs["return"] = result
-                    if write_log or not is_succeed:
-                        mess = f"function {name} end ({status}) ({func_id}) (Duration: {delta})"
-                        if is_succeed:
-                            self.debug(mess, **end_kwargs)
-                        else:
-                            end_kwargs["args"] = args
-                            end_kwargs["kwargs"] = kwargs
-                            self.debug(mess, **end_kwargs)
+
+                duration_ns = None
+                if measured:
+                    duration_ns = perf_counter_ns() - before
+                    self.measure.append(self.name, name, duration_ns / 1e9)
+                elif timing:
+                    self.measure.append_call(self.name, name)
+                if write_log:
+                    self.log_function_end(
+                        func_id=func_id,
+                        name=name,
+                        duration_ns=duration_ns,
+                        is_succeed=True,
+                        result=result,
+                        args=args,
+                        kwargs=kwargs,
+                        with_return=with_return,
+                    )
+                return result
 
             return process
 
@@ -142,6 +240,9 @@ class MyLogger(object):
             @wraps(handler)
             @self.logger.inject_lambda_context()
             def process(event, context: LambdaContextDummy, *args, **kwargs):
+                InvocationContextBorg().set_context(context)
+                # 初期化処理などの実行の外で計測した値を今回の実行に含めない
+                self.measure.reset_invocation()
                 try:
                     # LambdaのRequest IDを環境変数に保存する (LogFormatterで使用するため)
                     os.environ[
@@ -159,8 +260,7 @@ class MyLogger(object):
                         event=event,
                         version={
                             "python": sys.version,
-                            "boto3": boto3.__version__,
-                            "botocore": botocore.__version__,
+                            **get_package_versions(),
                         },
                         environments={
                             k: v
@@ -182,7 +282,22 @@ class MyLogger(object):
                     self.error(f"Exception occurred in handler: {e}")
                     raise
                 finally:
-                    self.debug("function stats", stats=self.measure.get_stats())
+                    stats = self.measure.get_stats()
+                    self.debug(
+                        "function stats",
+                        stats=stats,
+                        lifetime_stats=self.measure.get_stats(lifetime=True),
+                        counters=self.counter.get_stats(),
+                    )
+                    try:
+                        emit_emf_records(
+                            handler_name=self.name,
+                            histograms=self.measure.get_histograms(lifetime=False),
+                        )
+                    except Exception as e:
+                        self.warning(f"Exception occurred in emitting metrics: {e}")
+                    self.measure.reset_invocation()
+                    self.counter.reset()
 
             return process
 
@@ -203,7 +318,14 @@ class MyLogger(object):
                     self.error(f"Exception occurred in main: [{type(e)}] {e}")
                     raise
                 finally:
-                    self.debug("function stats", stats=self.measure.get_stats())
+                    self.debug(
+                        "function stats",
+                        stats=self.measure.get_stats(),
+                        lifetime_stats=self.measure.get_stats(lifetime=True),
+                        counters=self.counter.get_stats(),
+                    )
+                    self.measure.reset_invocation()
+                    self.counter.reset()
 
             return process
 
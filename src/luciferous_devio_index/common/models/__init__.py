@@ -1 +1 @@
-from .models import SlugMappingData
+from .models import PostMetadata, Sitemap, SitemapData, SlugMappingData
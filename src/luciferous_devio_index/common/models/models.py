@@ -1,4 +1,7 @@
 from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+from urllib.parse import quote, unquote
 
 
 @dataclass(frozen=True)
@@ -6,3 +9,68 @@ class SlugMappingData:
     slug: str
     post_id: str
     timestamp: int
+
+
+@dataclass(frozen=True)
+class SitemapData:
+    slug: str
+    updated_at: int
+
+
+@dataclass(frozen=True)
+class Sitemap:
+    url: str
+    updated_at: int
+
+
+@dataclass(frozen=True)
+class PostMetadata:
+    """記事のS3オブジェクトのメタデータに保存する項目
+
+    S3のメタデータはASCIIのみのため、slugはパーセントエンコードして保存する。
+    """
+
+    post_id: str
+    slug: str
+    modified_gmt: str
+
+    @classmethod
+    def from_post(cls, data: dict) -> "PostMetadata":
+        return cls(
+            post_id=str(data["id"]),
+            slug=data["slug"],
+            modified_gmt=data["modified_gmt"],
+        )
+
+    @classmethod
+    def from_s3_metadata(cls, metadata: Dict[str, str]) -> Optional["PostMetadata"]:
+        """メタデータが揃っていない (メタデータを保存する前の) オブジェクトの場合は `None` を返す"""
+        try:
+            return cls(
+                post_id=metadata["post-id"],
+                slug=unquote(metadata["slug"]),
+                modified_gmt=metadata["modified-gmt"],
+            )
+        except KeyError:
+            return None
+
+    def to_s3_metadata(self) -> Dict[str, str]:
+        return {
+            "post-id": self.post_id,
+            "slug": quote(self.slug, safe=""),
+            "modified-gmt": self.modified_gmt,
+        }
+
+    def get_timestamp(self) -> int:
+        """更新日時をUNIX時間のミリ秒で返す"""
+        return int(
+            datetime.strptime(
+                f"{self.modified_gmt}+0000", "%Y-%m-%dT%H:%M:%S%z"
+            ).timestamp()
+            * 1000
+        )
+
+    def to_slug_mapping_data(self) -> SlugMappingData:
+        return SlugMappingData(
+            slug=self.slug, post_id=self.post_id, timestamp=self.get_timestamp()
+        )
@@ -0,0 +1,13 @@
+from .post_pack import (
+    CompactionResult,
+    PackEntry,
+    PackIndex,
+    compact_packs,
+    create_pack_index_key,
+    create_shard_key,
+    delete_shards,
+    iter_shard_posts,
+    load_pack_index,
+    read_packed_post,
+    save_pack_index,
+)
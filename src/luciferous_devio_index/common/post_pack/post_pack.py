@@ -0,0 +1,355 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from os.path import basename
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+from zipfile import ZipFile
+
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+    from luciferous_devio_index.common.subpage_index import Content
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+PACK_INDEX_VERSION = 1
+DEFAULT_MAX_SHARD_BYTES = 32 * 1024 * 1024
+# 生きている記事がこれを下回ったシャードは、新しい記事や他の小さいシャードとまとめて詰め直す
+DEFAULT_MIN_SHARD_BYTES = 8 * 1024 * 1024
+# 生きている記事の割合がこれを下回ったシャードは詰め直す
+DEFAULT_MIN_LIVE_RATIO = 0.5
+
+
+@dataclass(frozen=True)
+class PackEntry:
+    """パックされた記事の位置
+
+    `last_modified_at` と `size` は元の記事のオブジェクトのもので、一致する間は詰め直さない。
+    `offset` と `length` はシャード内のgzipのメンバーの位置で、その範囲だけを取得して展開できる。
+    """
+
+    post_id: int
+    last_modified_at: str
+    size: int
+    shard: int
+    offset: int
+    length: int
+
+    def get_range(self) -> str:
+        return f"bytes={self.offset}-{self.offset + self.length - 1}"
+
+
+@dataclass
+class PackIndex:
+    """パックのインデックス
+
+    `retired` は詰め直して参照しなくなったシャードで、前のインデックスを読んだ読み手のために
+    次の世代のインデックスを保存するまで削除しない。
+    """
+
+    shards: Dict[int, int] = field(default_factory=dict)
+    entries: Dict[int, PackEntry] = field(default_factory=dict)
+    retired: List[int] = field(default_factory=list)
+
+    def get_live_bytes(self) -> Dict[int, int]:
+        result = {x: 0 for x in self.shards}
+        for entry in self.entries.values():
+            result[entry.shard] = result.get(entry.shard, 0) + entry.length
+        return result
+
+    def get_next_shard(self) -> int:
+        # 削除を待っているシャードの番号も使わず、読み手が参照している間に上書きしない
+        return max([*self.shards, *self.retired], default=0) + 1
+
+
+@dataclass(frozen=True)
+class CompactionResult:
+    index: PackIndex
+    packed: int
+    moved: int
+    removed_shards: List[int]
+
+
+def create_pack_index_key(pack_dir: str) -> str:
+    return f"{pack_dir}/index.json.gz"
+
+
+def create_shard_key(*, pack_dir: str, shard: int) -> str:
+    return f"{pack_dir}/pack-{shard:06d}.ndjson.gz"
+
+
+def encode_member(text: str) -> bytes:
+    # 1記事を1つのgzipのメンバーにし、範囲を指定した取得でも単独で展開できるようにする
+    return gzip.compress(f"{text}\n".encode(), mtime=0)
+
+
+@logger.logging_function(with_return=False)
+def load_pack_index(*, bucket: str, key: str, s3_client: "S3Client") -> PackIndex:
+    """パックのインデックスを読み込む
+
+    インデックスが存在しない場合やバージョンが異なる場合は空のインデックスを返し、全件をパックし直させる。
+    """
+    try:
+        resp = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        logger.info("pack index is missing", bucket=bucket, key=key)
+        return PackIndex()
+    data = json.loads(gzip.decompress(resp["Body"].read()))
+    if data.get("version") != PACK_INDEX_VERSION:
+        logger.warning("pack index version mismatch", version=data.get("version"))
+        return PackIndex()
+    return PackIndex(
+        shards={int(k): v for k, v in data["shards"].items()},
+        entries={x[0]: PackEntry(*x) for x in data["entries"]},
+        retired=data.get("retired", []),
+    )
+
+
+@logger.logging_function(with_arg=False)
+def save_pack_index(*, bucket: str, key: str, index: PackIndex, s3_client: "S3Client"):
+    data = {
+        "version": PACK_INDEX_VERSION,
+        "shards": {str(k): v for k, v in sorted(index.shards.items())},
+        "entries": [
+            [x.post_id, x.last_modified_at, x.size, x.shard, x.offset, x.length]
+            for _, x in sorted(index.entries.items())
+        ],
+        "retired": sorted(index.retired),
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        Body=gzip.compress(json.dumps(data, separators=(",", ":")).encode()),
+    )
+
+
+class ShardWriter(object):
+    """記事を上限のサイズまで1つのシャードに詰め、上限を超える前にアップロードする"""
+
+    def __init__(
+        self,
+        *,
+        bucket: str,
+        pack_dir: str,
+        first_shard: int,
+        max_shard_bytes: int,
+        s3_client: "S3Client",
+    ):
+        self.bucket = bucket
+        self.pack_dir = pack_dir
+        self.shard = first_shard
+        self.max_shard_bytes = max_shard_bytes
+        self.s3_client = s3_client
+        self.buffer = BytesIO()
+        self.written: Dict[int, int] = {}
+
+    def append(
+        self, *, post_id: int, last_modified_at: str, size: int, member: bytes
+    ) -> PackEntry:
+        position = self.buffer.tell()
+        if position > 0 and position + len(member) > self.max_shard_bytes:
+            self.flush()
+            position = 0
+        self.buffer.write(member)
+        return PackEntry(
+            post_id=post_id,
+            last_modified_at=last_modified_at,
+            size=size,
+            shard=self.shard,
+            offset=position,
+            length=len(member),
+        )
+
+    def flush(self):
+        if self.buffer.tell() == 0:
+            return
+        body = self.buffer.getvalue()
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=create_shard_key(pack_dir=self.pack_dir, shard=self.shard),
+            ContentType="application/gzip",
+            Body=body,
+        )
+        counter.add("post_pack", "shard_bytes", len(body))
+        self.written[self.shard] = len(body)
+        self.shard += 1
+        self.buffer = BytesIO()
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def compact_packs(
+    *,
+    bucket: str,
+    prefix: str,
+    pack_dir: str,
+    contents: List["Content"],
+    index: PackIndex,
+    s3_client: "S3Client",
+    max_posts: int,
+    max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES,
+    min_shard_bytes: int = DEFAULT_MIN_SHARD_BYTES,
+    min_live_ratio: float = DEFAULT_MIN_LIVE_RATIO,
+) -> CompactionResult:
+    """記事ごとのオブジェクトの変更をシャードに反映する
+
+    S3のオブジェクトには追記できないため、変更された記事は新しいシャードに書き込み、
+    古いシャードの該当箇所はインデックスから外して使わなくする。
+    使われていない割合が大きくなったシャードと、生きている記事が `min_shard_bytes` に満たない小さいシャードは、
+    残っている記事を変更された記事と一緒に新しいシャードに移し、シャードの数を減らす。
+    移し終えたシャードはインデックスの `retired` に記録し、次の実行で削除する。
+    インデックスはシャードを書き込んだ後に保存し、削除は呼び出し側でインデックスの保存後に行う。
+
+    Args:
+        bucket: バケット
+        prefix: 記事のプレフィックス
+        pack_dir: シャードとインデックスを置くディレクトリ
+        contents: 記事ごとのオブジェクトの一覧
+        index: 現在のインデックス
+        s3_client: S3のクライアント
+        max_posts: 1回でパックする変更された記事の上限 (残りは古い位置のまま次回に回す)
+        max_shard_bytes: 1シャードのサイズの上限
+        min_shard_bytes: 詰め直さずに残すシャードの生きている記事のサイズの下限
+        min_live_ratio: 詰め直さずに残すシャードの生きている記事の割合の下限
+
+    Returns:
+        新しいインデックスと件数、インデックスの保存後に削除してよいシャード
+    """
+    current = {x.number: x for x in contents if x.number >= 0}
+    entries = {
+        post_id: entry
+        for post_id, entry in index.entries.items()
+        if post_id in current
+        and current[post_id].last_modified_at == entry.last_modified_at
+        and current[post_id].size == entry.size
+    }
+    changed = [x for x in sorted(current) if x not in entries]
+    stale = changed[:max_posts]
+    # 上限を超えて次回に回す記事は、書き込むまで古い位置を残して読めるようにする
+    # (古い位置の記事も生きているものとして数え、シャードが削除されないようにする)
+    for post_id in changed[max_posts:]:
+        if post_id in index.entries:
+            entries[post_id] = index.entries[post_id]
+    live = PackIndex(shards=index.shards, entries=entries).get_live_bytes()
+    sparse = {
+        x for x, total in index.shards.items() if live[x] < total * min_live_ratio
+    }
+    small = {x for x in index.shards if live[x] < min_shard_bytes}
+    # 小さいシャードは、まとめる相手 (新しい記事か他のシャード) がある場合だけ詰め直す
+    if not stale and len(sparse | small) < 2:
+        small = set()
+    candidates = sorted(sparse | small)
+    writer = ShardWriter(
+        bucket=bucket,
+        pack_dir=pack_dir,
+        first_shard=index.get_next_shard(),
+        max_shard_bytes=max_shard_bytes,
+        s3_client=s3_client,
+    )
+    moved = 0
+    for shard in candidates:
+        members = [x for x in entries.values() if x.shard == shard]
+        if not members:
+            continue
+        body = s3_client.get_object(
+            Bucket=bucket, Key=create_shard_key(pack_dir=pack_dir, shard=shard)
+        )["Body"].read()
+        for entry in members:
+            entries[entry.post_id] = writer.append(
+                post_id=entry.post_id,
+                last_modified_at=entry.last_modified_at,
+                size=entry.size,
+                member=body[entry.offset : entry.offset + entry.length],
+            )
+            moved += 1
+    with ThreadPoolExecutor(max_workers=min(len(stale), 10) or 1) as executor:
+        texts = executor.map(
+            lambda x: read_post_text(
+                bucket=bucket, key=f"{prefix}{current[x].name}", s3_client=s3_client
+            ),
+            stale,
+        )
+        for post_id, text in zip(stale, texts):
+            if text is None:
+                continue
+            entries[post_id] = writer.append(
+                post_id=post_id,
+                last_modified_at=current[post_id].last_modified_at,
+                size=current[post_id].size,
+                member=encode_member(text),
+            )
+    writer.flush()
+    shards = {x: v for x, v in index.shards.items() if x not in candidates}
+    shards.update(writer.written)
+    counter.add("post_pack", "packed", len(stale))
+    counter.add("post_pack", "moved", moved)
+    return CompactionResult(
+        index=PackIndex(shards=shards, entries=entries, retired=candidates),
+        packed=len(stale),
+        moved=moved,
+        removed_shards=list(index.retired),
+    )
+
+
+def read_post_text(*, bucket: str, key: str, s3_client: "S3Client") -> Optional[str]:
+    # 記事のスキーマはパックを書き込むときだけ使うため、importを遅らせる
+    from luciferous_devio_index.common.wordpress import dump_post, normalize_post
+
+    try:
+        resp = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    with ZipFile(BytesIO(resp["Body"].read())) as zf:
+        with zf.open(basename(key.replace(".zip", ""))) as f:
+            # シャードにはスキーマのバージョンによらず最新の形式で保存する
+            return dump_post(normalize_post(json.load(f)))
+
+
+@logger.logging_function()
+def delete_shards(
+    *, bucket: str, pack_dir: str, shards: List[int], s3_client: "S3Client"
+):
+    for i in range(0, len(shards), 1000):
+        s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={
+                "Objects": [
+                    {"Key": create_shard_key(pack_dir=pack_dir, shard=x)}
+                    for x in shards[i : i + 1000]
+                ],
+                "Quiet": True,
+            },
+        )
+
+
+def read_packed_post(
+    *, bucket: str, pack_dir: str, entry: PackEntry, s3_client: "S3Client"
+) -> dict:
+    """範囲を指定した取得で1記事だけを読み込む"""
+    resp = s3_client.get_object(
+        Bucket=bucket,
+        Key=create_shard_key(pack_dir=pack_dir, shard=entry.shard),
+        Range=entry.get_range(),
+    )
+    return json.loads(gzip.decompress(resp["Body"].read()))
+
+
+def iter_shard_posts(
+    *, bucket: str, pack_dir: str, shard: int, s3_client: "S3Client"
+) -> Iterator[dict]:
+    """シャード全体を先頭から読み込む
+
+    インデックスから外れた古い記事も含むため、必要に応じてインデックスと照合する。
+    """
+    resp = s3_client.get_object(
+        Bucket=bucket, Key=create_shard_key(pack_dir=pack_dir, shard=shard)
+    )
+    with gzip.open(resp["Body"], mode="rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,9 @@
+from .rate_limiter import (
+    DynamoDbRateLimiterBackend,
+    MemoryRateLimiterBackend,
+    RateLimiterBackend,
+    TokenBucketRateLimiter,
+    TokenBucketState,
+    create_rate_limiter,
+    create_rate_limiter_from_environment,
+)
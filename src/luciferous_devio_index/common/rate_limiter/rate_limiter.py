@@ -0,0 +1,198 @@
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from decimal import Decimal
+from threading import Lock
+from time import sleep, time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from luciferous_devio_index.common.aws import create_resource
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+ENVIRONMENT_NAME_RATE_LIMITER = "DEVIO_RATE_LIMITER"
+ENVIRONMENT_NAME_RATE_LIMIT_PER_SEC = "DEVIO_RATE_LIMIT_PER_SEC"
+ENVIRONMENT_NAME_RATE_LIMIT_BURST = "DEVIO_RATE_LIMIT_BURST"
+
+
+@dataclass(frozen=True)
+class TokenBucketState:
+    tokens: float
+    updated_at: float
+
+
+class RateLimiterBackend(ABC):
+    """トークンバケットの状態を保存するバックエンドの基底クラス
+
+    `compare_and_set` は現在の状態が `expected` と一致する場合だけ `new` に更新し、更新できたかどうかを返す。
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[TokenBucketState]:
+        pass
+
+    @abstractmethod
+    def compare_and_set(
+        self, key: str, expected: Optional[TokenBucketState], new: TokenBucketState
+    ) -> bool:
+        pass
+
+
+class MemoryRateLimiterBackend(RateLimiterBackend):
+    """プロセス内に状態を保存するバックエンド (ローカルでの検証用)"""
+
+    def __init__(self):
+        self.states: Dict[str, TokenBucketState] = {}
+        self.lock = Lock()
+
+    def get(self, key: str) -> Optional[TokenBucketState]:
+        return self.states.get(key)
+
+    def compare_and_set(
+        self, key: str, expected: Optional[TokenBucketState], new: TokenBucketState
+    ) -> bool:
+        with self.lock:
+            if self.states.get(key) != expected:
+                return False
+            self.states[key] = new
+            return True
+
+
+class DynamoDbRateLimiterBackend(RateLimiterBackend):
+    """ハッシュキーが `key` のDynamoDBテーブルに状態を保存し、条件付き書き込みで更新するバックエンド"""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.table = None
+
+    def get_table(self):
+        if self.table is None:
+            self.table = create_resource("dynamodb").Table(self.table_name)
+        return self.table
+
+    def get(self, key: str) -> Optional[TokenBucketState]:
+        item = (
+            self.get_table().get_item(Key={"key": key}, ConsistentRead=True).get("Item")
+        )
+        if item is None:
+            return None
+        return TokenBucketState(
+            tokens=float(item["tokens"]), updated_at=float(item["updated_at"])
+        )
+
+    def compare_and_set(
+        self, key: str, expected: Optional[TokenBucketState], new: TokenBucketState
+    ) -> bool:
+        from boto3.dynamodb.conditions import Attr
+
+        table = self.get_table()
+        if expected is None:
+            condition = Attr("key").not_exists()
+        else:
+            condition = Attr("updated_at").eq(to_decimal(expected.updated_at)) & Attr(
+                "tokens"
+            ).eq(to_decimal(expected.tokens))
+        try:
+            table.put_item(
+                Item={
+                    "key": key,
+                    "tokens": to_decimal(new.tokens),
+                    "updated_at": to_decimal(new.updated_at),
+                },
+                ConditionExpression=condition,
+            )
+            return True
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+
+def to_decimal(value: float) -> Decimal:
+    return Decimal(repr(round(value, 6)))
+
+
+class TokenBucketRateLimiter(object):
+    """複数のLambdaの実行環境で共有するトークンバケット方式のレートリミッター
+
+    Args:
+        rate: 1秒あたりに補充されるトークン数 (全体で許容するリクエスト数)
+        capacity: バケットの容量 (バーストとして許容するリクエスト数)
+        backend: 状態を保存するバックエンド
+    """
+
+    def __init__(self, *, rate: float, capacity: float, backend: RateLimiterBackend):
+        self.rate = rate
+        self.capacity = capacity
+        self.backend = backend
+
+    def refill(self, state: Optional[TokenBucketState], now: float) -> float:
+        if state is None:
+            return self.capacity
+        elapsed = max(now - state.updated_at, 0)
+        return min(self.capacity, state.tokens + elapsed * self.rate)
+
+    def acquire(self, key: str, *, timeout: Optional[float] = None) -> float:
+        """トークンを1つ取得できるまで待機する
+
+        Args:
+            key: バケットのキー (ホスト名など)
+            timeout: 待機する最大の秒数
+
+        Returns:
+            待機した秒数
+        """
+        start = time()
+        while True:
+            now = time()
+            state = self.backend.get(key)
+            tokens = self.refill(state, now)
+            if tokens >= 1:
+                new = TokenBucketState(tokens=tokens - 1, updated_at=now)
+                if self.backend.compare_and_set(key, state, new):
+                    waited = now - start
+                    counter.add("rate_limiter", "acquired")
+                    counter.add("rate_limiter", "waited_sec", waited)
+                    return waited
+                counter.add("rate_limiter", "conflicts")
+                continue
+
+            wait = (1 - tokens) / self.rate
+            if timeout is not None and now + wait - start > timeout:
+                raise TimeoutError(f"failed to acquire rate limit token: key={key}")
+            sleep(wait)
+
+
+@logger.logging_function()
+def create_rate_limiter(
+    uri: str, *, rate: float, capacity: float
+) -> TokenBucketRateLimiter:
+    """URI形式の指定からレートリミッターを作成する
+
+    Args:
+        uri: `memory` または `dynamodb://table`
+        rate: 1秒あたりに補充されるトークン数
+        capacity: バケットの容量
+
+    Returns:
+        レートリミッター
+    """
+    parsed = urlparse(uri)
+    if parsed.scheme == "" and parsed.path == "memory":
+        backend = MemoryRateLimiterBackend()
+    elif parsed.scheme == "dynamodb":
+        backend = DynamoDbRateLimiterBackend(table_name=parsed.netloc)
+    else:
+        raise ValueError(f"invalid rate limiter backend: {uri}")
+    return TokenBucketRateLimiter(rate=rate, capacity=capacity, backend=backend)
+
+
+def create_rate_limiter_from_environment() -> Optional[TokenBucketRateLimiter]:
+    if (uri := os.environ.get(ENVIRONMENT_NAME_RATE_LIMITER)) is None:
+        return None
+    return create_rate_limiter(
+        uri,
+        rate=float(os.environ.get(ENVIRONMENT_NAME_RATE_LIMIT_PER_SEC, "1")),
+        capacity=float(os.environ.get(ENVIRONMENT_NAME_RATE_LIMIT_BURST, "1")),
+    )
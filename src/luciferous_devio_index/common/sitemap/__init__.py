@@ -0,0 +1,7 @@
+from .iso8601 import parse_iso8601_msec
+from .sitemap import (
+    open_sitemap_stream,
+    parse_individual_sitemap,
+    parse_root_sitemap,
+    parse_slug,
+)
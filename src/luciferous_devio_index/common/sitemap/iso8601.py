@@ -0,0 +1,56 @@
+from datetime import datetime
+
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_iso8601_msec(text: str) -> int:
+    """固定フォーマットのISO-8601文字列をUNIXエポックのミリ秒に変換する
+
+    `YYYY-MM-DDTHH:MM:SS` に小数秒と `Z` / `+HH:MM` / `+HHMM` のタイムゾーンが続く形式を
+    文字列のスライスだけで解釈する。タイムゾーンがない場合はUTCとして扱う。
+    想定外の形式の場合は `datetime.strptime` で解釈する。
+
+    Args:
+        text: ISO-8601形式の日時文字列
+
+    Returns:
+        UNIXエポックのミリ秒
+    """
+    text = text.strip()
+    try:
+        if text[4] != "-" or text[7] != "-" or text[10] not in "T " or text[13] != ":":
+            raise ValueError(text)
+        seconds = (
+            _days_from_civil(int(text[0:4]), int(text[5:7]), int(text[8:10])) * 86400
+            + int(text[11:13]) * 3600
+            + int(text[14:16]) * 60
+            + int(text[17:19])
+        )
+        msec = 0
+        pos = 19
+        if len(text) > pos and text[pos] == ".":
+            end = pos + 1
+            while end < len(text) and text[end].isdigit():
+                end += 1
+            msec = int(text[pos + 1 : end][:3].ljust(3, "0"))
+            pos = end
+
+        tz = text[pos:]
+        if tz in ("", "Z"):
+            offset = 0
+        elif tz[0] in "+-" and len(tz) in (5, 6):
+            offset = int(tz[1:3]) * 3600 + int(tz[-2:]) * 60
+            if tz[0] == "-":
+                offset = -offset
+        else:
+            raise ValueError(text)
+    except (IndexError, ValueError):
+        return int(datetime.strptime(text, "%Y-%m-%dT%H:%M:%S%z").timestamp() * 1000)
+    return (seconds - offset) * 1000 + msec
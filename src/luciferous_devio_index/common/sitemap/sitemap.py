@@ -0,0 +1,93 @@
+from gzip import GzipFile
+from typing import BinaryIO, Dict, Iterator, Optional
+
+from lxml import etree
+
+from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.models import Sitemap, SitemapData
+
+from .iso8601 import parse_iso8601_msec
+
+logger = MyLogger(__name__)
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+
+
+def open_sitemap_stream(*, fp: BinaryIO, url: Optional[str] = None) -> BinaryIO:
+    """サイトマップのストリームを必要に応じてgzip展開するストリームで包む
+
+    URLが `.gz` で終わるか、先頭がgzipのマジックナンバーの場合は展開しながら読み込む。
+
+    Args:
+        fp: HTTPレスポンスなどの `read()` を持つストリーム
+        url: サイトマップのURL
+
+    Returns:
+        XMLを読み出せるストリーム
+    """
+    if url is not None and url.endswith(".gz"):
+        return GzipFile(fileobj=fp, mode="rb")
+    if hasattr(fp, "peek") and fp.peek(2)[:2] == GZIP_MAGIC_NUMBER:
+        return GzipFile(fileobj=fp, mode="rb")
+    return fp
+
+
+def iter_sitemap_elements(*, fp: BinaryIO, tag: str) -> Iterator[Dict[str, str]]:
+    """サイトマップから指定した要素を逐次読み込み、子要素の名前とテキストの辞書を返す
+
+    名前空間は無視し、読み込み済みの要素は都度破棄するためメモリ使用量はエントリ数に依存しない。
+
+    Args:
+        fp: XMLを読み出せるストリーム
+        tag: 対象の要素名 (`url` や `sitemap`)
+
+    Returns:
+        子要素の名前とテキストの辞書のイテレーター
+    """
+    for _, elem in etree.iterparse(
+        fp,
+        events=("end",),
+        tag=("{*}" + tag, tag),
+        resolve_entities=False,
+        no_network=True,
+    ):
+        yield {
+            child.tag.rsplit("}", 1)[-1]: child.text or ""
+            for child in elem
+            if isinstance(child.tag, str)
+        }
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def parse_slug(url: str) -> str:
+    for part in reversed(url.split("/")):
+        if part:
+            return part
+
+
+@logger.logging_function(with_arg=False)
+def parse_individual_sitemap(
+    *, fp: BinaryIO, url: Optional[str] = None
+) -> Iterator[SitemapData]:
+    for item in iter_sitemap_elements(
+        fp=open_sitemap_stream(fp=fp, url=url), tag="url"
+    ):
+        yield SitemapData(
+            slug=parse_slug(item["loc"].strip()),
+            updated_at=parse_iso8601_msec(item["lastmod"]),
+        )
+
+
+@logger.logging_function(with_arg=False)
+def parse_root_sitemap(
+    *, fp: BinaryIO, prefix: str, url: Optional[str] = None
+) -> Iterator[Sitemap]:
+    for item in iter_sitemap_elements(
+        fp=open_sitemap_stream(fp=fp, url=url), tag="sitemap"
+    ):
+        loc = item["loc"].strip()
+        if loc.find(prefix) == -1:
+            continue
+        yield Sitemap(url=loc, updated_at=parse_iso8601_msec(item["lastmod"]))
@@ -0,0 +1,5 @@
+from .slug_mapping import (
+    SlugMappingWriteResult,
+    get_map_slug_mapping_data,
+    put_newer_slug_mapping_data,
+)
@@ -0,0 +1,180 @@
+from dataclasses import asdict, dataclass
+from time import sleep
+from typing import TYPE_CHECKING, Dict, List
+
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+from luciferous_devio_index.common.models import SlugMappingData
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+BATCH_GET_ITEM_MAX_KEYS = 100
+BATCH_GET_ITEM_MAX_ATTEMPTS = 8
+BATCH_WRITE_ITEM_MAX_ITEMS = 25
+BATCH_WRITE_ITEM_MAX_ATTEMPTS = 8
+
+
+@dataclass(frozen=True)
+class SlugMappingWriteResult:
+    batch_written: int
+    conditionally_written: int
+    skipped: int
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def get_map_slug_mapping_data(
+    *, slugs: List[str], table_name: str, ddb_resource: "DynamoDBServiceResource"
+) -> Dict[str, SlugMappingData]:
+    unique_slugs = list(dict.fromkeys(slugs))
+    result: Dict[str, SlugMappingData] = {}
+    for i in range(0, len(unique_slugs), BATCH_GET_ITEM_MAX_KEYS):
+        result.update(
+            batch_get_slug_mapping_data(
+                slugs=unique_slugs[i : i + BATCH_GET_ITEM_MAX_KEYS],
+                table_name=table_name,
+                ddb_resource=ddb_resource,
+            )
+        )
+    return result
+
+
+@logger.logging_function(with_return=False)
+def batch_get_slug_mapping_data(
+    *, slugs: List[str], table_name: str, ddb_resource: "DynamoDBServiceResource"
+) -> Dict[str, SlugMappingData]:
+    result: Dict[str, SlugMappingData] = {}
+    request_items = {
+        table_name: {
+            "Keys": [{"slug": x} for x in slugs],
+            "ProjectionExpression": "slug, post_id, #timestamp",
+            "ExpressionAttributeNames": {"#timestamp": "timestamp"},
+        }
+    }
+    for attempt in range(BATCH_GET_ITEM_MAX_ATTEMPTS):
+        if attempt > 0:
+            sleep(min(0.05 * 2**attempt, 2.0))
+        resp = ddb_resource.batch_get_item(RequestItems=request_items)
+        for item in resp["Responses"].get(table_name, []):
+            result[item["slug"]] = SlugMappingData(**item)
+        request_items = resp.get("UnprocessedKeys", {})
+        if len(request_items) == 0:
+            return result
+        logger.debug(
+            "unprocessed keys remain",
+            attempt=attempt,
+            count=len(request_items[table_name]["Keys"]),
+        )
+    raise RuntimeError(f"failed to get all slug mapping data from {table_name}")
+
+
+@logger.logging_function(with_arg=False)
+def put_newer_slug_mapping_data(
+    *,
+    list_data: List[SlugMappingData],
+    table_name: str,
+    ddb_resource: "DynamoDBServiceResource",
+) -> SlugMappingWriteResult:
+    """slugの対応を、保存済みのものより新しい場合だけ書き込む
+
+    まとめて読み込んだ保存済みの項目と比べ、同じか古いものは書き込まない。
+    保存済みの項目がないslugは初めての書き込みのため、BatchWriteItemでまとめて書き込む。
+    (同じslugを別の実行が同時に初めて書き込んだ場合に限り、古い方が残りうる)
+    保存済みの項目より新しいものは、読み込んだ後に他の実行が書き込んだ場合に備え、
+    `timestamp` が新しいときだけ書き込む条件付きのPutItemで書き込む。
+
+    Args:
+        list_data: 書き込むslugの対応
+        table_name: テーブル名
+        ddb_resource: DynamoDBのリソース
+
+    Returns:
+        書き込み方法ごとの件数
+    """
+    latest: Dict[str, SlugMappingData] = {}
+    for data in list_data:
+        if data.slug not in latest or latest[data.slug].timestamp < data.timestamp:
+            latest[data.slug] = data
+    existing = get_map_slug_mapping_data(
+        slugs=list(latest), table_name=table_name, ddb_resource=ddb_resource
+    )
+    missing = [x for x in latest.values() if x.slug not in existing]
+    newer = [
+        x
+        for x in latest.values()
+        if x.slug in existing and existing[x.slug].timestamp < x.timestamp
+    ]
+    for i in range(0, len(missing), BATCH_WRITE_ITEM_MAX_ITEMS):
+        batch_write_slug_mapping_data(
+            list_data=missing[i : i + BATCH_WRITE_ITEM_MAX_ITEMS],
+            table_name=table_name,
+            ddb_resource=ddb_resource,
+        )
+    conditionally_written = sum(
+        put_slug_mapping_data_if_newer(
+            data=x, table_name=table_name, ddb_resource=ddb_resource
+        )
+        for x in newer
+    )
+    result = SlugMappingWriteResult(
+        batch_written=len(missing),
+        conditionally_written=conditionally_written,
+        skipped=len(list_data) - len(missing) - conditionally_written,
+    )
+    counter.add("slug_mapping", "batch_written", result.batch_written)
+    counter.add("slug_mapping", "conditionally_written", result.conditionally_written)
+    counter.add("slug_mapping", "skipped", result.skipped)
+    return result
+
+
+@logger.logging_function(with_arg=False)
+def batch_write_slug_mapping_data(
+    *,
+    list_data: List[SlugMappingData],
+    table_name: str,
+    ddb_resource: "DynamoDBServiceResource",
+):
+    request_items = {
+        table_name: [{"PutRequest": {"Item": asdict(x)}} for x in list_data]
+    }
+    for attempt in range(BATCH_WRITE_ITEM_MAX_ATTEMPTS):
+        if attempt > 0:
+            sleep(min(0.05 * 2**attempt, 2.0))
+        resp = ddb_resource.batch_write_item(RequestItems=request_items)
+        request_items = resp.get("UnprocessedItems", {})
+        if len(request_items) == 0:
+            return
+        logger.debug(
+            "unprocessed items remain",
+            attempt=attempt,
+            count=len(request_items[table_name]),
+        )
+    raise RuntimeError(f"failed to write all slug mapping data to {table_name}")
+
+
+@logger.logging_function()
+def put_slug_mapping_data_if_newer(
+    *,
+    data: SlugMappingData,
+    table_name: str,
+    ddb_resource: "DynamoDBServiceResource",
+) -> bool:
+    """保存済みの項目がないか、`timestamp` が古い場合だけ書き込む
+
+    Returns:
+        書き込んだ場合は `True`
+    """
+    from boto3.dynamodb.conditions import Attr
+
+    try:
+        ddb_resource.Table(table_name).put_item(
+            Item=asdict(data),
+            ConditionExpression=Attr("slug").not_exists()
+            | Attr("timestamp").lt(data.timestamp),
+        )
+    except ddb_resource.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.debug("newer slug mapping data already exists", slug=data.slug)
+        return False
+    return True
@@ -0,0 +1,39 @@
+from .catalog import (
+    CATALOG_HEAD_NAME,
+    DEFAULT_SHARD_SPAN,
+    CatalogEntry,
+    create_catalog_state_key,
+    load_catalog_state,
+    read_catalog_entry,
+    render_catalog,
+    save_catalog_state,
+    sync_catalog_entries,
+)
+from .compression import (
+    ENCODED_VARIANT_SUFFIXES,
+    CompressionLevels,
+    EncodedVariant,
+    create_encoded_variants,
+)
+from .manifest import (
+    Content,
+    ObjectChange,
+    create_manifest_key,
+    list_contents,
+    load_manifest,
+    parse_object_changes,
+    patch_contents,
+    save_manifest,
+)
+from .pages import (
+    DEFAULT_PAGE_SIZE,
+    Page,
+    create_pages_state_key,
+    get_template,
+    load_pages_state,
+    render_landing,
+    render_page,
+    save_pages_state,
+    split_pages,
+)
+from .rebuild import RebuildLease, is_rebuild_trigger, send_rebuild_trigger
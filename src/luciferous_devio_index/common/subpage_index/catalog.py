@@ -0,0 +1,236 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from hashlib import sha256
+from io import BytesIO
+from os.path import basename
+from typing import TYPE_CHECKING, Dict, List, Optional
+from zipfile import ZipFile
+
+from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.models import PostMetadata
+
+from .manifest import Content, format_last_modified
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+logger = MyLogger(__name__)
+
+CATALOG_STATE_VERSION = 1
+CATALOG_HEAD_VERSION = 1
+# post_idの範囲でシャードを分け、記事の追加や更新で書き換わるシャードを限定する
+DEFAULT_SHARD_SPAN = 10000
+# ヘッドファイルに載せる最新の変更の件数
+DEFAULT_LATEST_COUNT = 100
+CATALOG_HEAD_NAME = "head.json"
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """カタログの1行
+
+    `modified` は記事の更新日時 (UNIX時間のミリ秒)、`last_modified_at` はS3のオブジェクトの更新日時。
+    `last_modified_at` と `size` がマニフェストと一致する間は記事を読み直さない。
+    """
+
+    post_id: int
+    slug: str
+    modified: int
+    size: int
+    key: str
+    last_modified_at: str
+
+    def get_shard_name(self, shard_span: int) -> str:
+        return f"shard-{self.post_id // shard_span}.ndjson"
+
+    def to_line(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, separators=(",", ":"))
+
+
+def create_catalog_state_key(target_dir: str) -> str:
+    return f"manifests/{target_dir}.catalog.json.gz"
+
+
+@logger.logging_function(with_return=False)
+def load_catalog_state(
+    *, bucket: str, key: str, shard_span: int, s3_client: "S3Client"
+) -> Dict[str, dict]:
+    """カタログの行とアップロード済みのファイルのダイジェストを読み込む
+
+    状態が存在しない場合やシャードの幅が異なる場合は空の状態を返し、カタログを作り直させる。
+
+    Returns:
+        `entries` (オブジェクト名から行への辞書) と `digests` (ファイル名からダイジェストへの辞書)
+    """
+    empty = {"entries": {}, "digests": {}}
+    try:
+        resp = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        logger.info("catalog state is missing", bucket=bucket, key=key)
+        return empty
+    try:
+        data = json.loads(gzip.decompress(resp["Body"].read()))
+        if data["version"] != CATALOG_STATE_VERSION or data["shard_span"] != shard_span:
+            raise ValueError("catalog state header mismatch")
+        return {
+            "entries": {basename(x["key"]): CatalogEntry(**x) for x in data["entries"]},
+            "digests": data["digests"],
+        }
+    except Exception as e:
+        logger.warning("catalog state is inconsistent", bucket=bucket, key=key, error=e)
+        return empty
+
+
+@logger.logging_function(with_arg=False)
+def save_catalog_state(
+    *,
+    bucket: str,
+    key: str,
+    shard_span: int,
+    entries: Dict[str, CatalogEntry],
+    digests: Dict[str, str],
+    s3_client: "S3Client",
+):
+    data = {
+        "version": CATALOG_STATE_VERSION,
+        "shard_span": shard_span,
+        "entries": [asdict(entries[x]) for x in sorted(entries)],
+        "digests": digests,
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        Body=gzip.compress(json.dumps(data, separators=(",", ":")).encode()),
+    )
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def sync_catalog_entries(
+    *,
+    entries: Dict[str, CatalogEntry],
+    contents: List[Content],
+    bucket: str,
+    prefix: str,
+    s3_client: "S3Client",
+) -> Dict[str, CatalogEntry]:
+    """マニフェストと食い違う行だけ記事を読み直してカタログに反映する
+
+    Args:
+        entries: オブジェクト名から行への辞書
+        contents: マニフェストの一覧
+        bucket: 記事のバケット
+        prefix: 記事のプレフィックス
+        s3_client: S3のクライアント
+
+    Returns:
+        オブジェクト名から行への辞書 (マニフェストにない行は除く)
+    """
+    result = {}
+    stale = []
+    for content in contents:
+        entry = entries.get(content.name)
+        if (
+            entry is not None
+            and entry.last_modified_at == content.last_modified_at
+            and entry.size == content.size
+        ):
+            result[content.name] = entry
+        else:
+            stale.append(f"{prefix}{content.name}")
+    logger.info("read stale catalog entries", count=len(stale))
+    with ThreadPoolExecutor(max_workers=min(len(stale), 10) or 1) as executor:
+        for entry in executor.map(
+            lambda key: read_catalog_entry(bucket=bucket, key=key, s3_client=s3_client),
+            stale,
+        ):
+            if entry is not None:
+                result[basename(entry.key)] = entry
+    return result
+
+
+def read_catalog_entry(
+    *, bucket: str, key: str, s3_client: "S3Client"
+) -> Optional[CatalogEntry]:
+    """記事のカタログの行を作成する
+
+    オブジェクトのメタデータから作成し、メタデータを保存する前のオブジェクトの場合だけ本文を読み込む。
+    """
+    try:
+        resp = s3_client.head_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    metadata = PostMetadata.from_s3_metadata(resp.get("Metadata", {}))
+    if metadata is None:
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except s3_client.exceptions.NoSuchKey:
+            return None
+        with ZipFile(BytesIO(body)) as zf:
+            with zf.open(basename(key.replace(".zip", ""))) as f:
+                metadata = PostMetadata.from_post(json.load(f))
+    return CatalogEntry(
+        post_id=int(metadata.post_id),
+        slug=metadata.slug,
+        modified=metadata.get_timestamp(),
+        size=resp["ContentLength"],
+        key=key,
+        last_modified_at=format_last_modified(resp["LastModified"]),
+    )
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def render_catalog(
+    *,
+    entries: Dict[str, CatalogEntry],
+    shard_span: int,
+    latest_count: int = DEFAULT_LATEST_COUNT,
+) -> Dict[str, bytes]:
+    """カタログのシャードとヘッドファイルを作成する
+
+    シャードはpost_idの順に1行ずつJSONを並べたNDJSONにする。
+    ヘッドファイルには各シャードの件数とダイジェスト、最新の変更を載せる。
+    内容が変わらない限り同じバイト列になるよう、作成日時は含めない。
+
+    Args:
+        entries: オブジェクト名から行への辞書
+        shard_span: 1シャードが受け持つpost_idの幅
+        latest_count: ヘッドファイルに載せる最新の変更の件数
+
+    Returns:
+        ファイル名から内容への辞書
+    """
+    shards: Dict[str, List[CatalogEntry]] = {}
+    for entry in sorted(entries.values(), key=lambda x: x.post_id):
+        shards.setdefault(entry.get_shard_name(shard_span), []).append(entry)
+    files = {
+        name: "".join(f"{x.to_line()}\n" for x in rows).encode()
+        for name, rows in shards.items()
+    }
+    latest = sorted(
+        entries.values(), key=lambda x: (x.modified, x.post_id), reverse=True
+    )[:latest_count]
+    head = {
+        "version": CATALOG_HEAD_VERSION,
+        "count": len(entries),
+        "shard_span": shard_span,
+        "shards": [
+            {
+                "name": name,
+                "count": len(rows),
+                "modified": max(x.modified for x in rows),
+                "sha256": sha256(files[name]).hexdigest(),
+            }
+            for name, rows in shards.items()
+        ],
+        "latest": [asdict(x) for x in latest],
+    }
+    files[CATALOG_HEAD_NAME] = json.dumps(
+        head, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    return files
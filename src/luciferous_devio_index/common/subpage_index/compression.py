@@ -0,0 +1,96 @@
+import gzip
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = MyLogger(__name__)
+counter = CounterBorg()
+
+ENV_GZIP_LEVEL = "INDEX_GZIP_LEVEL"
+ENV_BROTLI_QUALITY = "INDEX_BROTLI_QUALITY"
+ENCODED_VARIANT_SUFFIXES = [".br", ".gz"]
+
+
+@dataclass(frozen=True)
+class EncodedVariant:
+    """兄弟キーとしてアップロードする圧縮済みの内容
+
+    CloudFront Functionが `Accept-Encoding` に応じて `index.html.br` / `index.html.gz` に振り分ける。
+    `encoding` が `None` の場合は圧縮していない内容を表す。
+    """
+
+    suffix: str
+    encoding: Optional[str]
+    body: bytes
+
+
+@dataclass(frozen=True)
+class CompressionLevels:
+    gzip: int
+    brotli: int
+
+    @classmethod
+    def from_environment(cls) -> "CompressionLevels":
+        return cls(
+            gzip=int(os.environ.get(ENV_GZIP_LEVEL, "9")),
+            brotli=int(os.environ.get(ENV_BROTLI_QUALITY, "11")),
+        )
+
+    def to_str(self) -> str:
+        return f"gzip={self.gzip},br={self.brotli if brotli is not None else 'none'}"
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def compress_gzip(*, body: bytes, level: int) -> bytes:
+    # 同じ内容から同じバイト列ができるよう、ヘッダーの時刻は0にする
+    result = gzip.compress(body, compresslevel=level, mtime=0)
+    counter.add("compression", "gzip_bytes_in", len(body))
+    counter.add("compression", "gzip_bytes_out", len(result))
+    return result
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def compress_brotli(*, body: bytes, quality: int) -> bytes:
+    result = brotli.compress(body, mode=brotli.MODE_TEXT, quality=quality)
+    counter.add("compression", "br_bytes_in", len(body))
+    counter.add("compression", "br_bytes_out", len(result))
+    return result
+
+
+def create_encoded_variants(
+    *, body: bytes, levels: CompressionLevels
+) -> List[EncodedVariant]:
+    """gzipとbrotliで圧縮した内容を作成する
+
+    brotliはレイヤーで提供するが、使えない環境では `.br` のキーにもgzipで圧縮した内容を
+    `ContentEncoding: gzip` で置く。CloudFront Functionの振り分け先を欠かさず、
+    brotliを受け取るクライアントにも圧縮していない内容を返さないため。
+
+    Args:
+        body: 圧縮する内容
+        levels: 圧縮レベル
+
+    Returns:
+        圧縮済みの内容のリスト
+    """
+    body_gzip = compress_gzip(body=body, level=levels.gzip)
+    variants = [EncodedVariant(suffix=".gz", encoding="gzip", body=body_gzip)]
+    if brotli is None:
+        logger.warning("brotli is not installed, upload gzip body as .br")
+        variants.append(EncodedVariant(suffix=".br", encoding="gzip", body=body_gzip))
+    else:
+        variants.append(
+            EncodedVariant(
+                suffix=".br",
+                encoding="br",
+                body=compress_brotli(body=body, quality=levels.brotli),
+            )
+        )
+    return variants
@@ -0,0 +1,282 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from os.path import basename
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+from luciferous_devio_index.common.logger import MyLogger
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+logger = MyLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# 全件取得のときにキーの範囲を分割する境界 (プレフィックス直後の文字列)
+DEFAULT_PARTITION_BOUNDARIES = ["1", "2", "3", "4", "5", "6", "7", "8", "9"]
+
+
+class Content(object):
+    """一覧の1行
+
+    行数が多いため `__slots__` で属性を固定し、並べ替えに使う名前の先頭の数値を作成時に計算しておく。
+    """
+
+    __slots__ = ("name", "last_modified_at", "size", "number")
+
+    def __init__(self, *, name: str, last_modified_at: str, size: int):
+        self.name = name
+        self.last_modified_at = last_modified_at
+        self.size = size
+        head = name.split(".", 1)[0]
+        self.number = int(head) if head.isdigit() else -1
+
+    def __repr__(self) -> str:
+        return (
+            f"Content(name={self.name!r}, last_modified_at={self.last_modified_at!r},"
+            f" size={self.size!r})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Content):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def to_tuple(self) -> Tuple[str, str, int]:
+        return self.name, self.last_modified_at, self.size
+
+    def get_number(self) -> int:
+        if self.number < 0:
+            raise ValueError(f"name does not start with a number: {self.name}")
+        return self.number
+
+
+@dataclass(frozen=True)
+class ObjectChange:
+    bucket: str
+    key: str
+
+
+def format_last_modified(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def create_manifest_key(target_dir: str) -> str:
+    return f"manifests/{target_dir}.json.gz"
+
+
+@logger.logging_function()
+def parse_object_changes(*, event: dict) -> List[ObjectChange]:
+    """SQSのイベントから変更されたS3オブジェクトを取り出す
+
+    S3から直接届いたメッセージとSNSを経由したメッセージのどちらにも対応する。
+
+    Args:
+        event: SQSのイベント
+
+    Returns:
+        変更されたオブジェクトのリスト (重複は除く)
+    """
+    result: Dict[Tuple[str, str], ObjectChange] = {}
+    for record in event.get("Records", []):
+        data = json.loads(record["body"])
+        if "Message" in data:
+            data = json.loads(data["Message"])
+        for s3_record in data.get("Records", []):
+            change = ObjectChange(
+                bucket=s3_record["s3"]["bucket"]["name"],
+                key=unquote_plus(s3_record["s3"]["object"]["key"]),
+            )
+            result[(change.bucket, change.key)] = change
+    return list(result.values())
+
+
+@logger.logging_function(with_return=False)
+def load_manifest(
+    *, bucket: str, key: str, prefix: str, extension: str, s3_client: "S3Client"
+) -> Optional[List[Content]]:
+    """S3に保存したマニフェストを読み込む
+
+    マニフェストが存在しない場合や、対象やバージョンが異なる・件数が合わないなど
+    整合性が取れない場合は `None` を返す。
+
+    Args:
+        bucket: マニフェストのバケット
+        key: マニフェストのキー
+        prefix: 一覧の対象のプレフィックス
+        extension: 一覧の対象の拡張子
+        s3_client: S3のクライアント
+
+    Returns:
+        名前順に並んだ一覧
+    """
+    try:
+        resp = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        logger.info("manifest is missing", bucket=bucket, key=key)
+        return None
+    try:
+        data = json.loads(gzip.decompress(resp["Body"].read()))
+        if (
+            data["version"] != MANIFEST_VERSION
+            or data["prefix"] != prefix
+            or data["extension"] != extension
+            or data["count"] != len(data["entries"])
+        ):
+            raise ValueError("manifest header mismatch")
+        contents = [
+            Content(name=name, last_modified_at=last_modified_at, size=size)
+            for name, last_modified_at, size in data["entries"]
+        ]
+    except Exception as e:
+        logger.warning("manifest is inconsistent", bucket=bucket, key=key, error=e)
+        return None
+    if any(a.name >= b.name for a, b in zip(contents, contents[1:])):
+        logger.warning("manifest is not sorted", bucket=bucket, key=key)
+        return None
+    return contents
+
+
+@logger.logging_function(with_arg=False)
+def save_manifest(
+    *,
+    bucket: str,
+    key: str,
+    prefix: str,
+    extension: str,
+    contents: List[Content],
+    s3_client: "S3Client",
+):
+    entries = [x.to_tuple() for x in sorted(contents, key=lambda x: x.name)]
+    data = {
+        "version": MANIFEST_VERSION,
+        "prefix": prefix,
+        "extension": extension,
+        "count": len(entries),
+        "entries": entries,
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        ContentType="application/json",
+        ContentEncoding="gzip",
+        Body=gzip.compress(json.dumps(data, separators=(",", ":")).encode()),
+    )
+
+
+@logger.logging_function(with_return=False)
+def list_contents(
+    *,
+    bucket: str,
+    prefix: str,
+    extension: str,
+    s3_client: "S3Client",
+    boundaries: Optional[List[str]] = None,
+) -> List[Content]:
+    """プレフィックス配下のオブジェクトをキーの範囲ごとに並列で全件取得する
+
+    Args:
+        bucket: バケット
+        prefix: 対象のプレフィックス
+        extension: 対象の拡張子
+        s3_client: S3のクライアント
+        boundaries: キーの範囲を分割する境界
+
+    Returns:
+        名前順に並んだ一覧
+    """
+    bounds = [f"{prefix}{x}" for x in boundaries or DEFAULT_PARTITION_BOUNDARIES]
+    ranges = list(zip([None] + bounds, bounds + [None]))
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        partitions = executor.map(
+            lambda x: list(
+                iter_partition(
+                    bucket=bucket,
+                    prefix=prefix,
+                    extension=extension,
+                    start_after=x[0],
+                    end_before=x[1],
+                    s3_client=s3_client,
+                )
+            ),
+            ranges,
+        )
+        return [content for partition in partitions for content in partition]
+
+
+def iter_partition(
+    *,
+    bucket: str,
+    prefix: str,
+    extension: str,
+    start_after: Optional[str],
+    end_before: Optional[str],
+    s3_client: "S3Client",
+) -> Iterator[Content]:
+    # 境界のキーは拡張子を持たないため対象外で、StartAfterで除外しても取りこぼさない
+    params = {"Bucket": bucket, "Prefix": prefix}
+    if start_after is not None:
+        params["StartAfter"] = start_after
+    for resp in s3_client.get_paginator("list_objects_v2").paginate(**params):
+        for x in resp.get("Contents", []):
+            if end_before is not None and x["Key"] >= end_before:
+                return
+            if x["Key"].endswith(extension):
+                yield Content(
+                    name=basename(x["Key"]),
+                    last_modified_at=format_last_modified(x["LastModified"]),
+                    size=x["Size"],
+                )
+
+
+@logger.logging_function(with_return=False)
+def patch_contents(
+    *,
+    contents: List[Content],
+    bucket: str,
+    keys: List[str],
+    s3_client: "S3Client",
+) -> List[Content]:
+    """変更されたキーの現在の状態をHEADで取得し、一覧に反映する
+
+    イベントの到着順に依存しないよう、イベントの種類ではなくオブジェクトの現在の状態を使う。
+
+    Args:
+        contents: 名前順に並んだ一覧
+        bucket: バケット
+        keys: 変更されたキー
+        s3_client: S3のクライアント
+
+    Returns:
+        名前順に並んだ一覧
+    """
+    map_contents = {x.name: x for x in contents}
+    with ThreadPoolExecutor(max_workers=min(len(keys), 10) or 1) as executor:
+        heads = executor.map(
+            lambda key: head_content(bucket=bucket, key=key, s3_client=s3_client),
+            keys,
+        )
+        for key, content in zip(keys, heads):
+            if content is None:
+                map_contents.pop(basename(key), None)
+            else:
+                map_contents[content.name] = content
+    return sorted(map_contents.values(), key=lambda x: x.name)
+
+
+def head_content(*, bucket: str, key: str, s3_client: "S3Client") -> Optional[Content]:
+    try:
+        resp = s3_client.head_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return Content(
+        name=basename(key),
+        last_modified_at=format_last_modified(resp["LastModified"]),
+        size=resp["ContentLength"],
+    )
@@ -0,0 +1,143 @@
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
+from typing import TYPE_CHECKING, Dict, List
+
+from luciferous_devio_index.common.jinja_templates import (
+    TEMPLATE_SUBPAGE_INDEX,
+    TEMPLATE_SUBPAGE_INDEX_PAGE,
+)
+from luciferous_devio_index.common.logger import MyLogger
+
+from .manifest import Content
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+    from mypy_boto3_s3 import S3Client
+
+logger = MyLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+PAGES_STATE_VERSION = 1
+TEMPLATE_PAGE_DIGEST = sha256(TEMPLATE_SUBPAGE_INDEX_PAGE.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class Page:
+    number: int
+    contents: List[Content]
+
+    def get_name(self) -> str:
+        return f"index-{self.number}.html"
+
+    def get_digest(self) -> str:
+        digest = sha256()
+        for content in self.contents:
+            digest.update(
+                f"{content.name}\t{content.last_modified_at}\t{content.size}\n".encode()
+            )
+        return digest.hexdigest()
+
+
+def create_pages_state_key(target_dir: str) -> str:
+    return f"manifests/{target_dir}.pages.json"
+
+
+@lru_cache(maxsize=None)
+def get_template(source: str) -> "Template":
+    """テンプレートをコンパイルする
+
+    コンパイル結果はコンテナ内で使い回す。
+    """
+    from jinja2 import Template
+
+    return Template(source)
+
+
+@logger.logging_function(with_arg=False, with_return=False)
+def split_pages(*, contents: List[Content], page_size: int) -> List[Page]:
+    """新しい順に並んだ一覧を固定サイズのページに分割する
+
+    ページは古い方から詰めて番号を振るため、新しい行が追加されても変わるのは最新のページだけになる。
+
+    Args:
+        contents: 新しい順に並んだ一覧
+        page_size: 1ページの行数
+
+    Returns:
+        新しい順に並んだページ (各ページの行も新しい順)
+    """
+    oldest_first = contents[::-1]
+    pages = [
+        Page(number=i // page_size + 1, contents=oldest_first[i : i + page_size][::-1])
+        for i in range(0, len(oldest_first), page_size)
+    ]
+    return pages[::-1]
+
+
+def render(template: "Template", **kwargs) -> bytes:
+    # 文字列を連結せずにチャンクごとにエンコードして書き込む
+    buffer = BytesIO()
+    for chunk in template.generate(**kwargs):
+        buffer.write(chunk.encode())
+    return buffer.getvalue()
+
+
+def render_page(*, target_dir: str, page: Page) -> bytes:
+    # ページの内容は自分の行だけで決まるようにし、他のページの増減で作り直さずに済むようにする
+    return render(get_template(TEMPLATE_SUBPAGE_INDEX_PAGE), path=target_dir, page=page)
+
+
+def render_landing(*, target_dir: str, pages: List[Page]) -> bytes:
+    return render(get_template(TEMPLATE_SUBPAGE_INDEX), path=target_dir, pages=pages)
+
+
+@logger.logging_function()
+def load_pages_state(
+    *, bucket: str, key: str, page_size: int, s3_client: "S3Client"
+) -> Dict[str, str]:
+    """アップロード済みのページのダイジェストを読み込む
+
+    状態が存在しない場合やページサイズ・テンプレートが異なる場合は空の辞書を返し、全ページを作り直させる。
+
+    Returns:
+        ページ名からダイジェストへの辞書
+    """
+    try:
+        resp = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return {}
+    data = json.load(resp["Body"])
+    if (
+        data.get("version") != PAGES_STATE_VERSION
+        or data.get("page_size") != page_size
+        or data.get("template") != TEMPLATE_PAGE_DIGEST
+    ):
+        return {}
+    return data["digests"]
+
+
+@logger.logging_function()
+def save_pages_state(
+    *,
+    bucket: str,
+    key: str,
+    page_size: int,
+    digests: Dict[str, str],
+    s3_client: "S3Client",
+):
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        ContentType="application/json",
+        Body=json.dumps(
+            {
+                "version": PAGES_STATE_VERSION,
+                "page_size": page_size,
+                "template": TEMPLATE_PAGE_DIGEST,
+                "digests": digests,
+            }
+        ).encode(),
+    )
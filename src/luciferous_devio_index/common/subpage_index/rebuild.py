@@ -0,0 +1,135 @@
+import json
+import time
+from decimal import Decimal
+from typing import TYPE_CHECKING, Optional
+
+from luciferous_devio_index.common.aws import create_resource
+from luciferous_devio_index.common.logger import MyLogger
+
+if TYPE_CHECKING:
+    from mypy_boto3_sqs import SQSClient
+
+logger = MyLogger(__name__)
+
+# SQSのDelaySecondsの上限
+MAX_DELAY_SEC = 900
+REBUILD_TRIGGER_KEY = "rebuild_target_dir"
+
+
+class RebuildLease(object):
+    """target_dirごとの再作成の間隔を制御するリース
+
+    DynamoDBの条件付き書き込みで、前回の再作成から `window_sec` 秒経つまでは
+    次の再作成を行わないようにする。間引いた変更を反映するため、後から再作成させる
+    トリガーを1つだけ予約できる。
+
+    項目の属性:
+        target_dir: パーティションキー
+        rebuilt_at: 最後にリースを取得した時刻 (UNIX時間)
+        scheduled_at: 後から再作成させるトリガーを予約した時刻 (UNIX時間)
+    """
+
+    def __init__(self, *, table_name: str, target_dir: str, window_sec: float):
+        self.table_name = table_name
+        self.target_dir = target_dir
+        self.window_sec = window_sec
+        self.table = create_resource("dynamodb").Table(table_name)
+
+    def acquire(self, now: Optional[float] = None) -> Optional[float]:
+        """リースを取得する
+
+        Returns:
+            取得できた場合はその時刻、前回の再作成から `window_sec` 秒経っていない場合は `None`
+        """
+        from boto3.dynamodb.conditions import Attr
+
+        now = time.time() if now is None else now
+        acquired_at = to_decimal(now)
+        try:
+            self.table.update_item(
+                Key={"target_dir": self.target_dir},
+                UpdateExpression="SET rebuilt_at = :now",
+                ConditionExpression=Attr("rebuilt_at").not_exists()
+                | Attr("rebuilt_at").lte(to_decimal(now - self.window_sec)),
+                ExpressionAttributeValues={":now": acquired_at},
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+        return float(acquired_at)
+
+    def release(self, acquired_at: float):
+        """再作成に失敗したとき、次の呼び出しがすぐに再作成できるようにリースを解放する"""
+        from boto3.dynamodb.conditions import Attr
+
+        try:
+            self.table.update_item(
+                Key={"target_dir": self.target_dir},
+                UpdateExpression="REMOVE rebuilt_at",
+                ConditionExpression=Attr("rebuilt_at").eq(to_decimal(acquired_at)),
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    def reserve_trigger(self, *, force: bool, now: Optional[float] = None) -> bool:
+        """後から再作成させるトリガーを予約する
+
+        前回の再作成の後にすでに予約されていれば予約しない。
+        `force` はトリガー自身がリースを取得できなかったときに使い、予約を取り直す。
+
+        Returns:
+            予約できた場合は `True`
+        """
+        from boto3.dynamodb.conditions import Attr
+
+        now = time.time() if now is None else now
+        kwargs = {}
+        if not force:
+            kwargs["ConditionExpression"] = (
+                Attr("scheduled_at").not_exists()
+                | Attr("rebuilt_at").not_exists()
+                | Attr("scheduled_at").lt(Attr("rebuilt_at"))
+            )
+        try:
+            self.table.update_item(
+                Key={"target_dir": self.target_dir},
+                UpdateExpression="SET scheduled_at = :now",
+                ExpressionAttributeValues={":now": to_decimal(now)},
+                **kwargs,
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def get_remaining_sec(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        item = self.table.get_item(
+            Key={"target_dir": self.target_dir}, ConsistentRead=True
+        ).get("Item", {})
+        rebuilt_at = float(item.get("rebuilt_at", 0))
+        return max(rebuilt_at + self.window_sec - now, 0)
+
+
+def to_decimal(value: float) -> Decimal:
+    return Decimal(str(round(value, 6)))
+
+
+def is_rebuild_trigger(*, event: dict) -> bool:
+    for record in event.get("Records", []):
+        try:
+            data = json.loads(record["body"])
+        except (KeyError, ValueError):
+            continue
+        if isinstance(data, dict) and REBUILD_TRIGGER_KEY in data:
+            return True
+    return False
+
+
+@logger.logging_function()
+def send_rebuild_trigger(
+    *, queue_url: str, target_dir: str, delay_sec: float, sqs_client: "SQSClient"
+):
+    sqs_client.send_message(
+        QueueUrl=queue_url,
+        MessageBody=json.dumps({REBUILD_TRIGGER_KEY: target_dir}),
+        DelaySeconds=min(int(delay_sec) + 1, MAX_DELAY_SEC),
+    )
@@ -0,0 +1,11 @@
+from .post_schema import (
+    DEFAULT_POST_FIELDS,
+    POST_SCHEMA_VERSION,
+    REQUIRED_POST_FIELDS,
+    create_post_url,
+    dump_post,
+    normalize_post,
+    parse_post_fields,
+    project_post,
+)
+from .wordpress import PostIdResolution, resolve_post_ids
@@ -0,0 +1,83 @@
+import json
+from typing import List
+
+# 保存する記事のスキーマのバージョン
+# 1はREST APIのレスポンスをそのまま保存したもので、`schema_version` を持たない
+POST_SCHEMA_VERSION = 2
+POST_SCHEMA_VERSION_LEGACY = 1
+# 下流の処理 (slugの登録、一覧、アーカイブ、埋め込み) が使う項目
+DEFAULT_POST_FIELDS = [
+    "id",
+    "slug",
+    "date_gmt",
+    "modified_gmt",
+    "status",
+    "link",
+    "title",
+    "excerpt",
+    "content",
+    "author",
+    "categories",
+    "tags",
+]
+
+
+# 記事のメタデータ (PostMetadata)、slugの登録、カタログが必ず使う項目
+REQUIRED_POST_FIELDS = ["id", "slug", "modified_gmt"]
+
+
+def parse_post_fields(value: str) -> List[str]:
+    """カンマ区切りの項目名を読み込む (空の場合は既定の項目)
+
+    設定に含まれていない必須の項目は先頭に加える。
+    """
+    fields = [x.strip() for x in value.split(",") if x.strip()]
+    if not fields:
+        return list(DEFAULT_POST_FIELDS)
+    return list(dict.fromkeys([*REQUIRED_POST_FIELDS, *fields]))
+
+
+def create_post_url(*, posts_url: str, post_id: str, fields: List[str]) -> str:
+    # `_fields` でREST APIのレスポンスを必要な項目だけに絞り込む
+    return f"{posts_url}/{post_id}?_fields={','.join(fields)}"
+
+
+def project_post(*, data: dict, fields: List[str]) -> dict:
+    """REST APIのレスポンスを保存する形式に変換する
+
+    指定した項目だけを残し、`{"rendered": ...}` の形の項目は文字列にする。
+
+    Args:
+        data: REST APIのレスポンス
+        fields: 残す項目
+
+    Returns:
+        保存する形式の記事
+    """
+    record = {"schema_version": POST_SCHEMA_VERSION}
+    for name in fields:
+        if name not in data:
+            continue
+        value = data[name]
+        if isinstance(value, dict) and "rendered" in value:
+            value = value["rendered"]
+        record[name] = value
+    return record
+
+
+def normalize_post(data: dict) -> dict:
+    """保存された記事をスキーマのバージョンによらず同じ形式で読み込む
+
+    バージョン1の記事は既定の項目で変換する。
+    """
+    version = data.get("schema_version", POST_SCHEMA_VERSION_LEGACY)
+    if version == POST_SCHEMA_VERSION:
+        return data
+    if version == POST_SCHEMA_VERSION_LEGACY:
+        return project_post(data=data, fields=DEFAULT_POST_FIELDS)
+    raise ValueError(f"unsupported post schema version: {version}")
+
+
+def dump_post(record: dict) -> str:
+    # 同じ内容から同じ文字列になるよう、キーを並べて空白を除く
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
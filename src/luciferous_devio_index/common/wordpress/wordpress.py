@@ -0,0 +1,87 @@
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+from urllib.parse import unquote
+
+from luciferous_devio_index.common.logger import MyLogger
+
+logger = MyLogger(__name__)
+
+POSTS_MAX_PER_PAGE = 100
+POSTS_MAX_URL_LENGTH = 4000
+
+
+@dataclass(frozen=True)
+class PostIdResolution:
+    found: Dict[str, str] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+
+
+def normalize_slug(slug: str) -> str:
+    return unquote(slug).lower()
+
+
+def create_posts_urls(*, posts_url: str, slugs: List[str]) -> Iterator[str]:
+    """複数のslugをまとめて問い合わせるpostsエンドポイントのURLを作成する
+
+    1リクエストあたりのslugの数は `per_page` の上限まで、URLの長さは `POSTS_MAX_URL_LENGTH` までに分割する。
+
+    Args:
+        posts_url: postsエンドポイントのURL
+        slugs: 問い合わせるslug
+
+    Returns:
+        postsエンドポイントのURLのイテレーター
+    """
+    prefix = f"{posts_url}?_fields=id,slug&per_page={POSTS_MAX_PER_PAGE}&slug="
+    chunk: List[str] = []
+    length = len(prefix)
+    for slug in slugs:
+        if chunk and (
+            len(chunk) == POSTS_MAX_PER_PAGE
+            or length + len(slug) + 1 > POSTS_MAX_URL_LENGTH
+        ):
+            yield prefix + ",".join(chunk)
+            chunk = []
+            length = len(prefix)
+        chunk.append(slug)
+        length += len(slug) + 1
+    if chunk:
+        yield prefix + ",".join(chunk)
+
+
+@logger.logging_function()
+def resolve_post_ids(*, posts_url: str, slugs: List[str]) -> PostIdResolution:
+    """slugに対応する記事のIDをまとめて取得する
+
+    postsエンドポイントの複数slug指定と `_fields` によるフィールドの絞り込みを使い、
+    最小限のリクエスト数でIDを取得する。複数のリクエストは非同期クライアントで転送を重ねて実行する。
+
+    Args:
+        posts_url: postsエンドポイントのURL
+        slugs: 記事のslug
+
+    Returns:
+        問い合わせたslugとIDの対応、および見つからなかったslug
+    """
+    # asyncioのimportは重いため、非同期クライアントは使うときにimportする
+    from luciferous_devio_index.common.http import async_http_client_sec3, fetch_all
+
+    unique_slugs = list(dict.fromkeys(slugs))
+    map_post_id: Dict[str, str] = {}
+    urls = list(create_posts_urls(posts_url=posts_url, slugs=unique_slugs))
+    for resp in fetch_all(urls=urls, client=async_http_client_sec3):
+        if isinstance(resp, Exception):
+            raise resp
+        for post in json.loads(resp.read()):
+            map_post_id[normalize_slug(post["slug"])] = str(post["id"])
+
+    result = PostIdResolution()
+    for slug in unique_slugs:
+        if (post_id := map_post_id.get(normalize_slug(slug))) is None:
+            result.missing.append(slug)
+        else:
+            result.found[slug] = post_id
+    if result.missing:
+        logger.info("post id not found", missing=result.missing)
+    return result
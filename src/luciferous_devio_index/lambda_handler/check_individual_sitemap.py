@@ -1,17 +1,20 @@
 import json
 from dataclasses import dataclass
-from datetime import datetime
-from typing import AnyStr, Iterator, List, Optional
-
-from bs4 import BeautifulSoup, Tag
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 from luciferous_devio_index.common.aws import create_resource
+from luciferous_devio_index.common.batch import process_sqs_batch
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.http import http_client_sec3
+from luciferous_devio_index.common.http import PooledResponse, http_client_sec3
 from luciferous_devio_index.common.logger import MyLogger
-from luciferous_devio_index.common.models import SlugMappingData
+from luciferous_devio_index.common.models import SitemapData, SlugMappingData
+from luciferous_devio_index.common.sitemap import parse_individual_sitemap
+from luciferous_devio_index.common.slug_mapping import get_map_slug_mapping_data
+from luciferous_devio_index.common.wordpress import resolve_post_ids
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_dynamodb.service_resource import Table
 
 
 @dataclass(frozen=True)
@@ -21,12 +24,6 @@ class EnvironmentVariables:
     table_post_id: str
 
 
-@dataclass(frozen=True)
-class SitemapData:
-    slug: str
-    updated_at: int
-
-
 logger = MyLogger(__name__)
 
 
@@ -34,21 +31,47 @@ logger = MyLogger(__name__)
 def handler(
     event: dict,
     context,
-    ddb_resource: DynamoDBServiceResource = create_resource("dynamodb"),
+    ddb_resource: "DynamoDBServiceResource" = create_resource("dynamodb"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
-    table_slug_mapping = ddb_resource.Table(env.table_slug_mapping)
     table_post_id = ddb_resource.Table(env.table_post_id)
-    url = parse_url(event=event)
-    text = get_sitemap(url=url)
+    return process_sqs_batch(
+        event=event,
+        process_record=lambda record: check_sitemap(
+            url=parse_url(record=record),
+            env=env,
+            table_post_id=table_post_id,
+            ddb_resource=ddb_resource,
+        ),
+    )
+
+
+def check_sitemap(
+    *,
+    url: str,
+    env: EnvironmentVariables,
+    table_post_id: "Table",
+    ddb_resource: "DynamoDBServiceResource",
+):
+    resp = get_sitemap(url=url)
+    list_sitemap = list(parse_individual_sitemap(fp=resp, url=url))
+    map_slug_mapping_data = get_map_slug_mapping_data(
+        slugs=[x.slug for x in list_sitemap],
+        table_name=env.table_slug_mapping,
+        ddb_resource=ddb_resource,
+    )
+    resolution = resolve_post_ids(
+        posts_url=env.devio_posts_url,
+        slugs=[x.slug for x in list_sitemap if x.slug not in map_slug_mapping_data],
+    )
     posts = [
         post_id
-        for sitemap in parse_individual_sitemap(text=text)
+        for sitemap in list_sitemap
         if (
             post_id := check_updated_post(
                 sitemap=sitemap,
-                url_devio_posts=env.devio_posts_url,
-                table_slug_mapping=table_slug_mapping,
+                slug_mapping_data=map_slug_mapping_data.get(sitemap.slug),
+                map_resolved_post_id=resolution.found,
             )
         )
         is not None
@@ -57,65 +80,28 @@ def handler(
 
 
 @logger.logging_function()
-def parse_url(*, event: dict) -> str:
-    if (url := event.get("url")) is not None:
+def parse_url(*, record: dict) -> str:
+    if (url := record.get("url")) is not None:
         return url
-    raw_ddb_event = event["Records"][0]["body"]
+    raw_ddb_event = record["body"]
     ddb_event = json.loads(raw_ddb_event)
     return ddb_event["dynamodb"]["Keys"]["url"]["S"]
 
 
 @logger.logging_function()
-def get_sitemap(*, url: str) -> AnyStr:
-    resp = http_client_sec3(url)
-    return resp.read()
-
-
-@logger.logging_function()
-def parse_individual_sitemap(*, text: AnyStr) -> Iterator[SitemapData]:
-    def parse_slug(url: str) -> str:
-        for part in reversed(url.split("/")):
-            if part:
-                return part
-
-    bs = BeautifulSoup(text, "xml")
-    for tag in bs.select("url"):
-        tag: Tag
-
-        slug = parse_slug(tag.select_one("loc").text)
-        lastmod = tag.select_one("lastmod").text
-        yield SitemapData(
-            slug=slug,
-            updated_at=int(
-                datetime.strptime(lastmod, "%Y-%m-%dT%H:%M:%S%z").timestamp() * 1000
-            ),
-        )
-
-
-@logger.logging_function()
-def get_slug_mapping_data(*, slug: str, table: Table) -> Optional[SlugMappingData]:
-    resp = table.get_item(Key={"slug": slug})
-    return None if (item := resp.get("Item")) is None else SlugMappingData(**item)
+def get_sitemap(*, url: str) -> PooledResponse:
+    return http_client_sec3(url)
 
 
-@logger.logging_function()
-def search_post_id(*, posts_url: str, slug: str) -> Optional[str]:
-    resp = http_client_sec3(f"{posts_url}?context=embed&slug={slug}")
-    data = json.loads(resp.read())
-    if len(data) == 0:
-        return None
-    return str(data[0]["id"])
-
-
-@logger.logging_function()
+@logger.logging_function(sample_rate=0.1)
 def check_updated_post(
-    *, sitemap: SitemapData, url_devio_posts: str, table_slug_mapping: Table
+    *,
+    sitemap: SitemapData,
+    slug_mapping_data: Optional[SlugMappingData],
+    map_resolved_post_id: Dict[str, str],
 ) -> Optional[str]:
-    slug_mapping_data = get_slug_mapping_data(
-        slug=sitemap.slug, table=table_slug_mapping
-    )
     if slug_mapping_data is None:
-        return search_post_id(posts_url=url_devio_posts, slug=sitemap.slug)
+        return map_resolved_post_id.get(sitemap.slug)
     elif slug_mapping_data.timestamp < sitemap.updated_at:
         return slug_mapping_data.post_id
     else:
@@ -123,7 +109,7 @@ def check_updated_post(
 
 
 @logger.logging_function()
-def put_posts(*, posts: List[str], table: Table):
+def put_posts(*, posts: List[str], table: "Table"):
     with table.batch_writer() as batch:
         for post_id in posts:
             batch.delete_item(Key={"post_id": post_id})
@@ -1,16 +1,23 @@
 from dataclasses import asdict, dataclass
-from datetime import datetime
-from typing import AnyStr, Iterator
+from typing import TYPE_CHECKING, Union
 
-from boto3.dynamodb.conditions import Attr, Or
-from bs4 import BeautifulSoup, Tag
-from mypy_boto3_dynamodb import DynamoDBClient, DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-
-from luciferous_devio_index.common.aws import create_client, create_resource
+from luciferous_devio_index.common.aws import create_resource
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.http import http_client_sec3
+from luciferous_devio_index.common.http import (
+    NotModified,
+    PooledResponse,
+    ValidatorStore,
+    create_validator_store,
+    http_client_sec3,
+    save_validator,
+)
 from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.models import Sitemap
+from luciferous_devio_index.common.sitemap import parse_root_sitemap
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_dynamodb.service_resource import Table
 
 
 @dataclass(frozen=True)
@@ -18,12 +25,7 @@ class EnvironmentVariables:
     dynamodb_table_name: str
     sitemap_url: str
     target_prefix: str
-
-
-@dataclass(frozen=True)
-class Sitemap:
-    url: str
-    updated_at: int
+    http_validator_store: str
 
 
 logger = MyLogger(__name__)
@@ -33,43 +35,33 @@ logger = MyLogger(__name__)
 def handler(
     event,
     context,
-    ddb_client: DynamoDBClient = create_client("dynamodb"),
-    ddb_resource: DynamoDBServiceResource = create_resource("dynamodb"),
+    ddb_resource: "DynamoDBServiceResource" = create_resource("dynamodb"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
     table = ddb_resource.Table(env.dynamodb_table_name)
-    text = get_sitemap(url=env.sitemap_url)
-    for sitemap in parse_root_sitemap(text=text, prefix=env.target_prefix):
-        put_item(sitemap=sitemap, table=table, ddb_client=ddb_client)
+    validator_store = create_validator_store(env.http_validator_store)
+    resp = get_sitemap(url=env.sitemap_url, validator_store=validator_store)
+    if isinstance(resp, NotModified):
+        logger.info("root sitemap is not modified", validator=resp.validator)
+        return
+    for sitemap in parse_root_sitemap(
+        fp=resp, prefix=env.target_prefix, url=env.sitemap_url
+    ):
+        put_item(sitemap=sitemap, table=table)
+    save_validator(url=env.sitemap_url, resp=resp, validator_store=validator_store)
 
 
 @logger.logging_function()
-def get_sitemap(*, url: str) -> AnyStr:
-    resp = http_client_sec3(url)
-    return resp.read()
+def get_sitemap(
+    *, url: str, validator_store: ValidatorStore
+) -> Union[PooledResponse, NotModified]:
+    return http_client_sec3(url, validator_store=validator_store)
 
 
 @logger.logging_function()
-def parse_root_sitemap(*, text: AnyStr, prefix: str) -> Iterator[Sitemap]:
-    bs = BeautifulSoup(text, "xml")
-    for tag in bs.select("sitemap"):
-        tag: Tag
-
-        url = tag.select_one("loc").text
-        if url.find(prefix) == -1:
-            continue
+def put_item(*, sitemap: Sitemap, table: "Table"):
+    from boto3.dynamodb.conditions import Attr, Or
 
-        lastmod = tag.select_one("lastmod").text
-        yield Sitemap(
-            url=url,
-            updated_at=int(
-                datetime.strptime(lastmod, "%Y-%m-%dT%H:%M:%S%z").timestamp() * 1000
-            ),
-        )
-
-
-@logger.logging_function()
-def put_item(*, sitemap: Sitemap, table: Table, ddb_client: DynamoDBClient):
     try:
         table.put_item(
             Item=asdict(sitemap),
@@ -77,5 +69,5 @@ def put_item(*, sitemap: Sitemap, table: Table, ddb_client: DynamoDBClient):
                 Attr("url").not_exists(), Attr("updated_at").lt(sitemap.updated_at)
             ),
         )
-    except ddb_client.exceptions.ConditionalCheckFailedException:
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
         pass
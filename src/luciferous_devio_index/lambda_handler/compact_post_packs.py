@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List
+
+from luciferous_devio_index.common.aws import create_client
+from luciferous_devio_index.common.dataclasses import load_environment
+from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.post_pack import (
+    compact_packs,
+    create_pack_index_key,
+    delete_shards,
+    load_pack_index,
+    save_pack_index,
+)
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+    from luciferous_devio_index.common.subpage_index import Content
+
+
+@dataclass(frozen=True)
+class EnvironmentVariables:
+    s3_bucket: str
+    target_dir: str
+    target_extension: str
+    pack_dir: str
+    max_posts_per_run: str
+
+
+logger = MyLogger(__name__)
+
+
+@logger.logging_handler()
+def handler(event, context, s3_client: "S3Client" = create_client("s3")):
+    """記事ごとのオブジェクトをシャードにまとめたパックを最新の状態に詰め直す
+
+    記事ごとのオブジェクトへの書き込みはこれまでどおり行い、このハンドラーが後から追いつく。
+    """
+    env = load_environment(class_dataclass=EnvironmentVariables)
+    contents = get_contents(env=env, s3_client=s3_client)
+    index_key = create_pack_index_key(env.pack_dir)
+    index = load_pack_index(bucket=env.s3_bucket, key=index_key, s3_client=s3_client)
+    result = compact_packs(
+        bucket=env.s3_bucket,
+        prefix=f"{env.target_dir}/",
+        pack_dir=env.pack_dir,
+        contents=contents,
+        index=index,
+        s3_client=s3_client,
+        max_posts=int(env.max_posts_per_run),
+    )
+    logger.info(
+        "compacted packs",
+        packed=result.packed,
+        moved=result.moved,
+        removed_shards=result.removed_shards,
+        retired_shards=result.index.retired,
+        shards=len(result.index.shards),
+        entries=len(result.index.entries),
+    )
+    if result.index == index:
+        return
+    save_pack_index(
+        bucket=env.s3_bucket, key=index_key, index=result.index, s3_client=s3_client
+    )
+    # 前の世代のインデックスからも参照されなくなったシャードだけを削除する
+    if result.removed_shards:
+        delete_shards(
+            bucket=env.s3_bucket,
+            pack_dir=env.pack_dir,
+            shards=result.removed_shards,
+            s3_client=s3_client,
+        )
+
+
+@logger.logging_function(with_return=False)
+def get_contents(
+    *, env: EnvironmentVariables, s3_client: "S3Client"
+) -> List["Content"]:
+    # 一覧の作成で更新されるマニフェストを使い、なければ全件取得する
+    # (一覧の作成のテンプレートなどを読み込まないよう、importを遅らせる)
+    from luciferous_devio_index.common.subpage_index import (
+        create_manifest_key,
+        list_contents,
+        load_manifest,
+    )
+
+    prefix = f"{env.target_dir}/"
+    contents = load_manifest(
+        bucket=env.s3_bucket,
+        key=create_manifest_key(env.target_dir),
+        prefix=prefix,
+        extension=env.target_extension,
+        s3_client=s3_client,
+    )
+    if contents is None:
+        contents = list_contents(
+            bucket=env.s3_bucket,
+            prefix=prefix,
+            extension=env.target_extension,
+            s3_client=s3_client,
+        )
+    return contents
@@ -1,16 +1,46 @@
 from dataclasses import dataclass
-from os.path import basename
-from typing import List
+from hashlib import sha256
+from typing import TYPE_CHECKING, List
 from uuid import uuid4
 
-from jinja2 import Template
-from mypy_boto3_cloudfront import CloudFrontClient
-from mypy_boto3_s3 import S3Client
-
 from luciferous_devio_index.common.aws import create_client
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.jinja_templates import TEMPLATE_SUBPAGE_INDEX
 from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.subpage_index import (
+    CATALOG_HEAD_NAME,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SHARD_SPAN,
+    ENCODED_VARIANT_SUFFIXES,
+    CompressionLevels,
+    Content,
+    Page,
+    RebuildLease,
+    create_catalog_state_key,
+    create_encoded_variants,
+    create_manifest_key,
+    create_pages_state_key,
+    is_rebuild_trigger,
+    list_contents,
+    load_catalog_state,
+    load_manifest,
+    load_pages_state,
+    parse_object_changes,
+    patch_contents,
+    render_catalog,
+    render_landing,
+    render_page,
+    save_catalog_state,
+    save_manifest,
+    save_pages_state,
+    send_rebuild_trigger,
+    split_pages,
+    sync_catalog_entries,
+)
+
+if TYPE_CHECKING:
+    from mypy_boto3_cloudfront import CloudFrontClient
+    from mypy_boto3_s3 import S3Client
+    from mypy_boto3_sqs import SQSClient
 
 
 @dataclass()
@@ -19,17 +49,10 @@ class EnvironmentVariables:
     target_dir: str
     target_extension: str
     distribution_id: str
-
-
-@dataclass()
-class Content:
-    name: str
-    last_modified_at: str
-    size: int
-
-    def get_number(self) -> int:
-        index = self.name.find(".")
-        return int(self.name[:index])
+    rebuild_lease_table: str
+    rebuild_window_sec: str
+    queue_url: str
+    catalog_dir: str
 
 
 logger = MyLogger(__name__)
@@ -39,14 +62,27 @@ logger = MyLogger(__name__)
 def handler(
     event,
     context,
-    s3_client: S3Client = create_client("s3"),
-    cloudfront_client: CloudFrontClient = create_client("cloudfront"),
+    s3_client: "S3Client" = create_client("s3"),
+    cloudfront_client: "CloudFrontClient" = create_client("cloudfront"),
+    sqs_client: "SQSClient" = create_client("sqs"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
-    contents = get_contents(env=env, s3_client=s3_client)
-    contents = sort_contents(target_dir=env.target_dir, contents=contents)
-    text = create_index_text(target_dir=env.target_dir, contents=contents)
-    upload_index(env=env, text=text, s3_client=s3_client)
+    # 変更はマニフェストに毎回反映し、ページの作成はリースで間引く
+    contents = get_contents(event=event, env=env, s3_client=s3_client)
+    lease = RebuildLease(
+        table_name=env.rebuild_lease_table,
+        target_dir=env.target_dir,
+        window_sec=float(env.rebuild_window_sec),
+    )
+    acquired_at = lease.acquire()
+    if acquired_at is None:
+        defer_rebuild(event=event, env=env, lease=lease, sqs_client=sqs_client)
+        return
+    try:
+        rebuild(env=env, contents=contents, s3_client=s3_client)
+    except Exception:
+        lease.release(acquired_at)
+        raise
     # create_invalidation(
     #    distribution_id=env.distribution_id,
     #    target_dir=env.target_dir,
@@ -54,28 +90,98 @@ def handler(
     # )
 
 
+@logger.logging_function(with_arg=False)
+def rebuild(
+    *, env: EnvironmentVariables, contents: List[Content], s3_client: "S3Client"
+):
+    contents = sort_contents(target_dir=env.target_dir, contents=contents)
+    pages = split_pages(contents=contents, page_size=DEFAULT_PAGE_SIZE)
+    upload_pages(env=env, pages=pages, s3_client=s3_client)
+    upload_html(
+        env=env,
+        name="index.html",
+        body=render_landing(target_dir=env.target_dir, pages=pages),
+        s3_client=s3_client,
+    )
+    if env.catalog_dir:
+        upload_catalog(env=env, contents=contents, s3_client=s3_client)
+
+
+@logger.logging_function(with_arg=False)
+def defer_rebuild(
+    *,
+    event: dict,
+    env: EnvironmentVariables,
+    lease: RebuildLease,
+    sqs_client: "SQSClient",
+):
+    """間隔内に再作成済みのため、間隔が明けてから再作成させるトリガーを1つだけ送る
+
+    トリガー自身がリースを取得できなかった場合は、変更を取りこぼさないよう予約を取り直す。
+    """
+    if not lease.reserve_trigger(force=is_rebuild_trigger(event=event)):
+        logger.info("rebuild is deferred to the trigger already scheduled")
+        return
+    send_rebuild_trigger(
+        queue_url=env.queue_url,
+        target_dir=env.target_dir,
+        delay_sec=lease.get_remaining_sec(),
+        sqs_client=sqs_client,
+    )
+
+
 @logger.logging_function(with_return=False)
-def get_contents(*, env: EnvironmentVariables, s3_client: S3Client) -> List[Content]:
-    result: List[Content] = []
-    for resp in s3_client.get_paginator("list_objects_v2").paginate(
-        Bucket=env.s3_bucket, Prefix=f"{env.target_dir}/"
-    ):
-        result += [
-            Content(
-                name=basename(x["Key"]),
-                last_modified_at=x["LastModified"].strftime("%Y-%m-%d %H:%M:%S"),
-                size=x["Size"],
-            )
-            for x in resp.get("Contents", [])
-            if x["Key"][-len(env.target_extension) :] == env.target_extension
-        ]
-    return result
+def get_contents(
+    *, event: dict, env: EnvironmentVariables, s3_client: "S3Client"
+) -> List[Content]:
+    prefix = f"{env.target_dir}/"
+    manifest_key = create_manifest_key(env.target_dir)
+    keys = [
+        x.key
+        for x in parse_object_changes(event=event)
+        if x.bucket == env.s3_bucket
+        and x.key.startswith(prefix)
+        and x.key.endswith(env.target_extension)
+    ]
+    contents = None
+    if "Records" in event:
+        # 変更のあったキーだけをマニフェストに反映する (直接の呼び出しは全件取得する)
+        contents = load_manifest(
+            bucket=env.s3_bucket,
+            key=manifest_key,
+            prefix=prefix,
+            extension=env.target_extension,
+            s3_client=s3_client,
+        )
+    if contents is None:
+        contents = list_contents(
+            bucket=env.s3_bucket,
+            prefix=prefix,
+            extension=env.target_extension,
+            s3_client=s3_client,
+        )
+    elif keys:
+        contents = patch_contents(
+            contents=contents, bucket=env.s3_bucket, keys=keys, s3_client=s3_client
+        )
+    else:
+        # 再作成のトリガーなど変更を含まないイベントではマニフェストをそのまま使う
+        return contents
+    save_manifest(
+        bucket=env.s3_bucket,
+        key=manifest_key,
+        prefix=prefix,
+        extension=env.target_extension,
+        contents=contents,
+        s3_client=s3_client,
+    )
+    return contents
 
 
-@logger.logging_function()
+@logger.logging_function(with_arg=False, with_return=False)
 def sort_contents(*, target_dir: str, contents: List[Content]) -> List[Content]:
     if target_dir == "posts":
-        return sorted(contents, key=lambda x: x.get_number(), reverse=True)
+        return sorted(contents, key=lambda x: x.number, reverse=True)
     elif target_dir == "archives":
         return sorted(contents, key=lambda x: x.name, reverse=True)
     else:
@@ -83,29 +189,183 @@ def sort_contents(*, target_dir: str, contents: List[Content]) -> List[Content]:
 
 
 @logger.logging_function(with_arg=False)
-def create_index_text(*, target_dir: str, contents: List[Content]) -> str:
-    template = Template(TEMPLATE_SUBPAGE_INDEX)
-    return template.render(path=target_dir, contents=contents)
+def upload_pages(
+    *, env: EnvironmentVariables, pages: List[Page], s3_client: "S3Client"
+):
+    """行が変わったページだけを作成してアップロードする
+
+    ページの行のダイジェストを前回の値と比べ、変わったページだけを作成する。
+    圧縮レベルを変えた場合は全ページを作り直す。不要になったページは削除する。
+    """
+    compression = CompressionLevels.from_environment().to_str()
+    state_key = create_pages_state_key(env.target_dir)
+    digests = load_pages_state(
+        bucket=env.s3_bucket,
+        key=state_key,
+        page_size=DEFAULT_PAGE_SIZE,
+        s3_client=s3_client,
+    )
+    new_digests = {}
+    for page in pages:
+        name = page.get_name()
+        new_digests[name] = f"{page.get_digest()}:{compression}"
+        if digests.get(name) == new_digests[name]:
+            continue
+        upload_html(
+            env=env,
+            name=name,
+            body=render_page(target_dir=env.target_dir, page=page),
+            s3_client=s3_client,
+        )
+    for name in digests.keys() - new_digests.keys():
+        delete_html(env=env, name=name, s3_client=s3_client)
+    logger.info(
+        "uploaded pages",
+        pages=len(pages),
+        changed=[k for k, v in new_digests.items() if digests.get(k) != v],
+        deleted=sorted(digests.keys() - new_digests.keys()),
+    )
+    if new_digests == digests:
+        return
+    save_pages_state(
+        bucket=env.s3_bucket,
+        key=state_key,
+        page_size=DEFAULT_PAGE_SIZE,
+        digests=new_digests,
+        s3_client=s3_client,
+    )
+
+
+@logger.logging_function(with_arg=False)
+def upload_catalog(
+    *, env: EnvironmentVariables, contents: List[Content], s3_client: "S3Client"
+):
+    """記事のカタログをNDJSONのシャードとヘッドファイルとしてアップロードする
+
+    前回から内容が変わったファイルだけをアップロードし、変わらないファイルのETagを保つ。
+    クライアントはヘッドファイルを条件付きGETで確認し、ダイジェストが変わったシャードだけを取得する。
+    ヘッドファイルは参照するシャードが揃ってから最後にアップロードする。
+    """
+    state_key = create_catalog_state_key(env.target_dir)
+    state = load_catalog_state(
+        bucket=env.s3_bucket,
+        key=state_key,
+        shard_span=DEFAULT_SHARD_SPAN,
+        s3_client=s3_client,
+    )
+    entries = sync_catalog_entries(
+        entries=state["entries"],
+        contents=contents,
+        bucket=env.s3_bucket,
+        prefix=f"{env.target_dir}/",
+        s3_client=s3_client,
+    )
+    files = render_catalog(entries=entries, shard_span=DEFAULT_SHARD_SPAN)
+    digests = {name: sha256(body).hexdigest() for name, body in files.items()}
+    changed = sorted(
+        (x for x in files if state["digests"].get(x) != digests[x]),
+        key=lambda x: x == CATALOG_HEAD_NAME,
+    )
+    for name in changed:
+        s3_client.put_object(
+            Bucket=env.s3_bucket,
+            Key=f"{env.catalog_dir}/{name}",
+            ContentType=(
+                "application/json"
+                if name == CATALOG_HEAD_NAME
+                else "application/x-ndjson"
+            ),
+            Body=files[name],
+        )
+    deleted = sorted(state["digests"].keys() - digests.keys())
+    if deleted:
+        s3_client.delete_objects(
+            Bucket=env.s3_bucket,
+            Delete={
+                "Objects": [{"Key": f"{env.catalog_dir}/{x}"} for x in deleted],
+                "Quiet": True,
+            },
+        )
+    logger.info("uploaded catalog", changed=changed, deleted=deleted)
+    if entries == state["entries"] and digests == state["digests"]:
+        return
+    save_catalog_state(
+        bucket=env.s3_bucket,
+        key=state_key,
+        shard_span=DEFAULT_SHARD_SPAN,
+        entries=entries,
+        digests=digests,
+        s3_client=s3_client,
+    )
 
 
 @logger.logging_function(with_arg=False)
-def upload_index(*, env: EnvironmentVariables, text: str, s3_client: S3Client):
+def upload_html(
+    *, env: EnvironmentVariables, name: str, body: bytes, s3_client: "S3Client"
+) -> bool:
+    """HTMLをgzip・brotliで圧縮した兄弟キーとあわせてアップロードする
+
+    元の内容のハッシュと圧縮レベルをメタデータに保存し、既存のオブジェクトと同じ場合はアップロードしない。
+    圧縮済みの内容を先にアップロードし、元の内容のメタデータが揃っていれば圧縮済みの内容も揃っているようにする。
+
+    Returns:
+        アップロードした場合は `True`
+    """
+    key = f"{env.target_dir}/{name}"
+    levels = CompressionLevels.from_environment()
+    metadata = {"sha256": sha256(body).hexdigest(), "compression": levels.to_str()}
+    try:
+        resp = s3_client.head_object(Bucket=env.s3_bucket, Key=key)
+        if resp.get("Metadata", {}) == metadata:
+            logger.debug("skip uploading unchanged html", key=key)
+            return False
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+            raise
+    for variant in create_encoded_variants(body=body, levels=levels):
+        kwargs = {}
+        if variant.encoding is not None:
+            kwargs["ContentEncoding"] = variant.encoding
+        s3_client.put_object(
+            Bucket=env.s3_bucket,
+            Key=f"{key}{variant.suffix}",
+            ContentType="text/html",
+            Body=variant.body,
+            Metadata=metadata,
+            **kwargs,
+        )
     s3_client.put_object(
         Bucket=env.s3_bucket,
-        Key=f"{env.target_dir}/index.html",
+        Key=key,
         ContentType="text/html",
-        Body=text.encode(),
+        Body=body,
+        Metadata=metadata,
+    )
+    return True
+
+
+@logger.logging_function(with_arg=False)
+def delete_html(*, env: EnvironmentVariables, name: str, s3_client: "S3Client"):
+    key = f"{env.target_dir}/{name}"
+    s3_client.delete_objects(
+        Bucket=env.s3_bucket,
+        Delete={
+            "Objects": [
+                {"Key": f"{key}{suffix}"} for suffix in ["", *ENCODED_VARIANT_SUFFIXES]
+            ],
+            "Quiet": True,
+        },
     )
 
 
 @logger.logging_function()
 def create_invalidation(
-    *, distribution_id: str, target_dir: str, cloudfront_client: CloudFrontClient
+    *, distribution_id: str, target_dir: str, cloudfront_client: "CloudFrontClient"
 ):
     cloudfront_client.create_invalidation(
         DistributionId=distribution_id,
         InvalidationBatch={
             "CallerReference": str(uuid4()),
-            "Paths": {"Quantity": 1, "Items": [f"/{target_dir}/index.html"]},
+            "Paths": {"Quantity": 1, "Items": [f"/{target_dir}/index*"]},
         },
     )
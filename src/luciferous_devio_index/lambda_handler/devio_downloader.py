@@ -1,17 +1,32 @@
 import json
 from dataclasses import dataclass
+from hashlib import sha256
 from io import BytesIO
-from typing import AnyStr
+from typing import TYPE_CHECKING, AnyStr, Dict, List, Optional, Union
 from urllib.error import HTTPError
 from zipfile import ZIP_DEFLATED, ZipFile
 from zlib import compress
 
-from mypy_boto3_s3 import S3Client
-
 from luciferous_devio_index.common.aws import create_client
+from luciferous_devio_index.common.batch import process_sqs_batch
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.http import http_client_sec3
-from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.http import (
+    FetchedResponse,
+    async_http_client_sec3,
+    fetch_all,
+)
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+from luciferous_devio_index.common.models import PostMetadata
+from luciferous_devio_index.common.wordpress import (
+    POST_SCHEMA_VERSION,
+    create_post_url,
+    dump_post,
+    parse_post_fields,
+    project_post,
+)
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
 
 
 @dataclass
@@ -19,41 +34,115 @@ class EnvironmentVariables:
     s3_bucket: str
     s3_prefix: str
     url_devio_posts: str
+    post_fields: str
 
 
 logger = MyLogger(__name__)
+counter = CounterBorg()
+
+METADATA_CONTENT_HASH = "content-sha256"
+METADATA_SCHEMA_VERSION = "schema-version"
 
 
 @logger.logging_handler(with_return=False)
-def handler(event: dict, context, s3_client: S3Client = create_client("s3")):
+def handler(event: dict, context, s3_client: "S3Client" = create_client("s3")):
     env = load_environment(class_dataclass=EnvironmentVariables)
-    post_id = parse_post_id(event=event)
-    try:
-        response = http_client_sec3(url=f"{env.url_devio_posts}/{post_id}")
-        post_data = response.read()
-    except HTTPError as e:
-        if e.status in [404, 401]:
-            logger.warning(
-                f"failed to get post data: post_id={post_id} status={e.status}, err={e}"
-            )
-            return
-        raise
-    save_to_s3(
+    list_post_id = parse_post_ids(event=event)
+    fields = parse_post_fields(env.post_fields)
+    # 記事はバッチ全体でまとめて並列にダウンロードし、保存はレコードごとに行う
+    responses = download_posts(
+        list_post_id=list_post_id, url_devio_posts=env.url_devio_posts, fields=fields
+    )
+    map_response = dict(zip(list_post_id, responses))
+    result = process_sqs_batch(
+        event=event,
+        process_record=lambda record: save_post(
+            post_id=(post_id := parse_post_id(record=record)),
+            response=map_response[post_id],
+            fields=fields,
+            env=env,
+            s3_client=s3_client,
+        ),
+    )
+    stats = counter.get_stats().get("devio_downloader", {})
+    total = stats.get("uploaded", 0) + stats.get("skipped", 0)
+    logger.info(
+        "saved posts",
+        uploaded=stats.get("uploaded", 0),
+        skipped=stats.get("skipped", 0),
+        skip_rate=stats.get("skipped", 0) / total if total else 0,
+    )
+    return result
+
+
+def save_post(
+    *,
+    post_id: str,
+    response: Union[FetchedResponse, Exception],
+    fields: List[str],
+    env: EnvironmentVariables,
+    s3_client: "S3Client",
+):
+    if isinstance(response, HTTPError) and response.status in [404, 401]:
+        logger.warning(
+            f"failed to get post data: post_id={post_id} status={response.status}, err={response}"
+        )
+        return
+    if isinstance(response, Exception):
+        logger.warning(f"failed to get post data: post_id={post_id}, err={response}")
+        raise response
+    uploaded = save_to_s3(
         post_id=post_id,
-        post_data=post_data,
+        post_data=response.read(),
+        fields=fields,
         s3_bucket=env.s3_bucket,
         s3_prefix=env.s3_prefix,
         s3_client=s3_client,
     )
+    counter.add("devio_downloader", "uploaded" if uploaded else "skipped")
 
 
 @logger.logging_function(with_arg=False)
-def parse_post_id(*, event: dict) -> str:
-    if (post_id := event.get("post_id")) is not None:
+def parse_post_ids(*, event: dict) -> List[str]:
+    # 壊れたレコードはダウンロードの対象から外し、レコードごとの処理で失敗として報告させる
+    result = []
+    for record in event.get("Records", [event]):
+        try:
+            result.append(parse_post_id(record=record))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("failed to parse post_id", error=e)
+    return result
+
+
+def parse_post_id(*, record: dict) -> str:
+    if (post_id := record.get("post_id")) is not None:
         return post_id
-    raw_ddb_event = event["Records"][0]["body"]
-    ddb_event = json.loads(raw_ddb_event)
-    return ddb_event["dynamodb"]["Keys"]["post_id"]["S"]
+    return json.loads(record["body"])["dynamodb"]["Keys"]["post_id"]["S"]
+
+
+@logger.logging_function(with_return=False)
+def download_posts(
+    *, list_post_id: List[str], url_devio_posts: str, fields: List[str]
+) -> List[Union[FetchedResponse, Exception]]:
+    return fetch_all(
+        urls=[
+            create_post_url(posts_url=url_devio_posts, post_id=x, fields=fields)
+            for x in list_post_id
+        ],
+        client=async_http_client_sec3,
+    )
+
+
+def get_metadata(
+    *, s3_bucket: str, key: str, s3_client: "S3Client"
+) -> Optional[Dict[str, str]]:
+    try:
+        resp = s3_client.head_object(Bucket=s3_bucket, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return resp.get("Metadata", {})
 
 
 @logger.logging_function(with_arg=False)
@@ -61,17 +150,62 @@ def save_to_s3(
     *,
     post_id: str,
     post_data: AnyStr,
+    fields: List[str],
     s3_bucket: str,
     s3_prefix: str,
-    s3_client: S3Client,
-):
+    s3_client: "S3Client",
+) -> bool:
+    """記事を保存する形式に変換し、zipで圧縮してS3に保存する
+
+    内容のハッシュをメタデータに保存し、既存のオブジェクトと同じ場合は保存しない。
+    保存しなければS3のイベントが発生せず、後続のslugの登録や一覧の作成も動かない。
+    zipには作成日時が含まれるため、圧縮後のバイト列ではなく変換後の内容で比較する。
+    slugやpost_id、更新日時もメタデータに保存し、後続の処理がHEADだけで読めるようにする。
+
+    Returns:
+        保存した場合は `True`
+    """
     data = json.loads(post_data)
-    text = json.dumps(data, ensure_ascii=False)
+    key = f"{s3_prefix}/{post_id}.json.zip"
+    text = dump_post(project_post(data=data, fields=fields))
+    metadata = {
+        METADATA_CONTENT_HASH: sha256(text.encode()).hexdigest(),
+        METADATA_SCHEMA_VERSION: str(POST_SCHEMA_VERSION),
+        **PostMetadata.from_post(data).to_s3_metadata(),
+    }
+    # メタデータが揃っていない既存のオブジェクトは、内容が同じでも保存し直す
+    if get_metadata(s3_bucket=s3_bucket, key=key, s3_client=s3_client) == metadata:
+        logger.info("skip saving unchanged post", post_id=post_id)
+        return False
     io = BytesIO()
     with ZipFile(file=io, mode="w", compression=ZIP_DEFLATED) as zf:
         zf.writestr(f"{post_id}.json", text)
+    report_post_size(
+        post_id=post_id,
+        fetched_bytes=len(post_data),
+        stored_bytes=len(text.encode()),
+        compressed_bytes=io.tell(),
+    )
     s3_client.put_object(
         Bucket=s3_bucket,
-        Key=f"{s3_prefix}/{post_id}.json.zip",
+        Key=key,
         Body=io.getvalue(),
+        Metadata=metadata,
+    )
+    return True
+
+
+def report_post_size(
+    *, post_id: str, fetched_bytes: int, stored_bytes: int, compressed_bytes: int
+):
+    counter.add("devio_downloader", "fetched_bytes", fetched_bytes)
+    counter.add("devio_downloader", "stored_bytes", stored_bytes)
+    counter.add("devio_downloader", "compressed_bytes", compressed_bytes)
+    logger.info(
+        "post size",
+        post_id=post_id,
+        fetched_bytes=fetched_bytes,
+        stored_bytes=stored_bytes,
+        compressed_bytes=compressed_bytes,
+        saved_ratio=1 - stored_bytes / fetched_bytes if fetched_bytes else 0,
     )
@@ -3,17 +3,19 @@ from base64 import b64decode
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from gzip import decompress
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from urllib.parse import quote_plus
 from urllib.request import Request, urlopen
 
-from mypy_boto3_ssm import SSMClient
-
 from luciferous_devio_index.common.aws import create_client
 from luciferous_devio_index.common.dataclasses import load_environment
 from luciferous_devio_index.common.logger import MyLogger
 from luciferous_devio_index.common.ssm import get_parameter_slack_incoming_webhook_url
 
+if TYPE_CHECKING:
+    from mypy_boto3_ssm import SSMClient
+
+
 jst = timezone(offset=timedelta(hours=+9), name="JST")
 
 
@@ -34,7 +36,7 @@ logger = MyLogger(__name__)
 
 
 @logger.logging_handler(with_return=False)
-def handler(event: dict, context, ssm_client: SSMClient = create_client("ssm")):
+def handler(event: dict, context, ssm_client: "SSMClient" = create_client("ssm")):
     log = parse_event(event=event)
     env = load_environment(class_dataclass=EnvironmentVariables)
     message = create_message(log=log, region=env.aws_default_region)
@@ -1,12 +1,14 @@
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 from uuid import uuid4
 
-from mypy_boto3_cloudfront import CloudFrontClient
-
 from luciferous_devio_index.common.aws import create_client
 from luciferous_devio_index.common.dataclasses import load_environment
 from luciferous_devio_index.common.logger import MyLogger
 
+if TYPE_CHECKING:
+    from mypy_boto3_cloudfront import CloudFrontClient
+
 
 @dataclass(frozen=True)
 class EnvironmentVariables:
@@ -18,7 +20,7 @@ logger = MyLogger(__name__)
 
 @logger.logging_handler()
 def handler(
-    event, context, client_cloudfront: CloudFrontClient = create_client("cloudfront")
+    event, context, client_cloudfront: "CloudFrontClient" = create_client("cloudfront")
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
     create_invalidation(
@@ -27,14 +29,15 @@ def handler(
 
 
 @logger.logging_function()
-def create_invalidation(*, distribution_id: str, cloudfront_client: CloudFrontClient):
+def create_invalidation(*, distribution_id: str, cloudfront_client: "CloudFrontClient"):
     cloudfront_client.create_invalidation(
         DistributionId=distribution_id,
         InvalidationBatch={
             "CallerReference": str(uuid4()),
             "Paths": {
                 "Quantity": 2,
-                "Items": ["/archives/index.html", f"/posts/index.html"],
+                # CloudFront Functionが圧縮済みの兄弟キーやページ番号付きのキーに振り分けるため、まとめて無効化する
+                "Items": ["/archives/index*", "/posts/index*"],
             },
         },
     )
@@ -1,22 +1,30 @@
 from dataclasses import dataclass
-from typing import List, Set
+from typing import TYPE_CHECKING, AnyStr, List, Set, Union
 from uuid import uuid4
 
-import feedparser
-from boto3.dynamodb.conditions import Attr
-from mypy_boto3_dynamodb import DynamoDBClient, DynamoDBServiceResource
-from mypy_boto3_sqs import SQSClient
-
 from luciferous_devio_index.common.aws import create_client, create_resource
 from luciferous_devio_index.common.dataclasses import load_environment
+from luciferous_devio_index.common.http import (
+    NotModified,
+    PooledResponse,
+    ValidatorStore,
+    create_validator_store,
+    http_client_sec3,
+    save_validator,
+)
 from luciferous_devio_index.common.logger import MyLogger
 
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_sqs import SQSClient
+
 
 @dataclass
 class EnvironmentVariables:
     url_feed: str
     table_name: str
     queue_url: str
+    http_validator_store: str
 
 
 logger = MyLogger(__name__)
@@ -26,26 +34,39 @@ logger = MyLogger(__name__)
 def handler(
     _event: dict,
     _context,
-    client_sqs: SQSClient = create_client("sqs"),
-    client_ddb: DynamoDBClient = create_client("dynamodb"),
-    resource_ddb: DynamoDBServiceResource = create_resource("dynamodb"),
+    client_sqs: "SQSClient" = create_client("sqs"),
+    resource_ddb: "DynamoDBServiceResource" = create_resource("dynamodb"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
-    entries = get_feed_entries(url=env.url_feed)
+    validator_store = create_validator_store(env.http_validator_store)
+    resp = get_feed(url=env.url_feed, validator_store=validator_store)
+    if isinstance(resp, NotModified):
+        logger.info("feed is not modified", validator=resp.validator)
+        return
+    entries = parse_feed_entries(text=resp.read())
     list_post_id = parse_post_id(entries=entries)
     check_post_id(list_post_id=list_post_id)
     for post_id in list_post_id:
         put_post_id(
             post_id=post_id,
             table_name=env.table_name,
-            ddb_client=client_ddb,
             ddb_resource=resource_ddb,
         )
+    save_validator(url=env.url_feed, resp=resp, validator_store=validator_store)
 
 
 @logger.logging_function()
-def get_feed_entries(*, url: str) -> List[dict]:
-    return feedparser.parse(url)["entries"]
+def get_feed(
+    *, url: str, validator_store: ValidatorStore
+) -> Union[PooledResponse, NotModified]:
+    return http_client_sec3(url, validator_store=validator_store)
+
+
+@logger.logging_function(with_arg=False)
+def parse_feed_entries(*, text: AnyStr) -> List[dict]:
+    import feedparser
+
+    return feedparser.parse(text)["entries"]
 
 
 @logger.logging_function(write_log=False)
@@ -61,18 +82,16 @@ def check_post_id(*, list_post_id: list[str]):
 
 @logger.logging_function()
 def put_post_id(
-    *,
-    post_id: str,
-    table_name: str,
-    ddb_client: DynamoDBClient,
-    ddb_resource: DynamoDBServiceResource
+    *, post_id: str, table_name: str, ddb_resource: "DynamoDBServiceResource"
 ):
+    from boto3.dynamodb.conditions import Attr
+
+    table = ddb_resource.Table(table_name)
     try:
-        table = ddb_resource.Table(table_name)
         table.put_item(
             Item={"post_id": post_id}, ConditionExpression=Attr("post_id").not_exists()
         )
-    except ddb_client.exceptions.ConditionalCheckFailedException:
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
         pass
 
 
@@ -82,7 +101,7 @@ def parse_url(*, entries: List[dict]) -> List[str]:
 
 
 @logger.logging_function(write_log=True, with_arg=True)
-def send_messages(*, list_url: List[str], queue_url: str, client: SQSClient):
+def send_messages(*, list_url: List[str], queue_url: str, client: "SQSClient"):
     union_succeeded_id: Set[str] = set()
     map_url = {str(uuid4()): x for x in list_url}
 
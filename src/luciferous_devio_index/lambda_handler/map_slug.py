@@ -1,17 +1,21 @@
 import json
-from dataclasses import asdict, dataclass
-from datetime import datetime
+from dataclasses import dataclass
 from io import BytesIO
 from os.path import basename
+from typing import TYPE_CHECKING, List
+from urllib.parse import unquote_plus
 from zipfile import ZipFile
 
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_s3 import S3Client
-
 from luciferous_devio_index.common.aws import create_client, create_resource
+from luciferous_devio_index.common.batch import process_sqs_batch
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.logger import MyLogger
-from luciferous_devio_index.common.models import SlugMappingData
+from luciferous_devio_index.common.logger import CounterBorg, MyLogger
+from luciferous_devio_index.common.models import PostMetadata, SlugMappingData
+from luciferous_devio_index.common.slug_mapping import put_newer_slug_mapping_data
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_s3 import S3Client
 
 
 @dataclass(frozen=True)
@@ -26,60 +30,76 @@ class S3Object:
 
 
 logger = MyLogger(__name__)
+counter = CounterBorg()
 
 
 @logger.logging_handler()
 def handler(
     event,
     context,
-    dynamodb_resource: DynamoDBServiceResource = create_resource("dynamodb"),
-    s3_client: S3Client = create_client("s3"),
+    dynamodb_resource: "DynamoDBServiceResource" = create_resource("dynamodb"),
+    s3_client: "S3Client" = create_client("s3"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
-    obj = parse_event(event=event)
-    post_data = get_post_data(obj=obj, s3_client=s3_client)
-    put_item(
-        post_data=post_data,
+    # 記事の読み込みはレコードごとに失敗を報告し、書き込みはバッチ全体でまとめて行う
+    list_post_data: List[SlugMappingData] = []
+    result = process_sqs_batch(
+        event=event,
+        process_record=lambda record: list_post_data.extend(
+            get_post_data(obj=x, s3_client=s3_client)
+            for x in parse_record(record=record)
+        ),
+    )
+    write_result = put_newer_slug_mapping_data(
+        list_data=list_post_data,
         table_name=env.dynamodb_table,
-        dynamodb_resource=dynamodb_resource,
+        ddb_resource=dynamodb_resource,
     )
+    logger.info(
+        "wrote slug mapping data",
+        batch_written=write_result.batch_written,
+        conditionally_written=write_result.conditionally_written,
+        skipped_as_redundant=write_result.skipped,
+    )
+    return result
 
 
 @logger.logging_function()
-def parse_event(*, event: dict) -> S3Object:
-    body = event["Records"][0]["body"]
+def parse_record(*, record: dict) -> List[S3Object]:
+    body = record["body"]
     data = json.loads(body)
     message = data["Message"]
     data = json.loads(message)
-    return S3Object(
-        bucket=data["Records"][0]["s3"]["bucket"]["name"],
-        key=data["Records"][0]["s3"]["object"]["key"],
-    )
+    return [
+        S3Object(bucket=x["s3"]["bucket"]["name"], key=x["s3"]["object"]["key"])
+        for x in data["Records"]
+    ]
 
 
 @logger.logging_function()
-def get_post_data(*, obj: S3Object, s3_client: S3Client) -> SlugMappingData:
-    resp = s3_client.get_object(Bucket=obj.bucket, Key=obj.key)
-    io = BytesIO(resp["Body"].read())
-    with ZipFile(io) as zf:
-        with zf.open(basename(obj.key.replace(".zip", ""))) as f:
-            data = json.load(f)
-    lastmod = data["modified_gmt"]
-    return SlugMappingData(
-        slug=data["slug"],
-        post_id=str(data["id"]),
-        timestamp=int(
-            datetime.strptime(f"{lastmod}+0000", "%Y-%m-%dT%H:%M:%S%z").timestamp()
-            * 1000
-        ),
-    )
+def get_post_data(*, obj: S3Object, s3_client: "S3Client") -> SlugMappingData:
+    """記事のslugの対応を取得する
+
+    オブジェクトのメタデータから取得し、メタデータを保存する前のオブジェクトの場合だけ本文を読み込む。
+    """
+    key = unquote_plus(obj.key)
+    resp = s3_client.head_object(Bucket=obj.bucket, Key=key)
+    metadata = PostMetadata.from_s3_metadata(resp.get("Metadata", {}))
+    if metadata is None:
+        counter.add("map_slug", "body_fallback")
+        metadata = get_post_metadata_from_body(
+            bucket=obj.bucket, key=key, s3_client=s3_client
+        )
+    return metadata.to_slug_mapping_data()
 
 
 @logger.logging_function()
-def put_item(
-    *,
-    post_data: SlugMappingData,
-    table_name: str,
-    dynamodb_resource: DynamoDBServiceResource,
-):
-    dynamodb_resource.Table(table_name).put_item(Item=asdict(post_data))
+def get_post_metadata_from_body(
+    *, bucket: str, key: str, s3_client: "S3Client"
+) -> PostMetadata:
+    resp = s3_client.get_object(Bucket=bucket, Key=key)
+    io = BytesIO(resp["Body"].read())
+    with ZipFile(io) as zf:
+        with zf.open(basename(key.replace(".zip", ""))) as f:
+            data = json.load(f)
+    return PostMetadata.from_post(data)
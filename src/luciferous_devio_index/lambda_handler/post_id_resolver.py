@@ -1,14 +1,15 @@
-import json
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, List
 
-from boto3.dynamodb.conditions import Attr
-from mypy_boto3_dynamodb import DynamoDBClient, DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-
-from luciferous_devio_index.common.aws import create_client, create_resource
+from luciferous_devio_index.common.aws import create_resource
+from luciferous_devio_index.common.batch import process_sqs_batch
 from luciferous_devio_index.common.dataclasses import load_environment
-from luciferous_devio_index.common.http import http_client_sec3
 from luciferous_devio_index.common.logger import MyLogger
+from luciferous_devio_index.common.wordpress import PostIdResolution, resolve_post_ids
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_dynamodb.service_resource import Table
 
 
 @dataclass
@@ -24,25 +25,50 @@ logger = MyLogger(__name__)
 def handler(
     event: dict,
     _context,
-    client_dynamodb: DynamoDBClient = create_client("dynamodb"),
-    resource_dynamodb: DynamoDBServiceResource = create_resource("dynamodb"),
+    resource_dynamodb: "DynamoDBServiceResource" = create_resource("dynamodb"),
 ):
     env = load_environment(class_dataclass=EnvironmentVariables)
     table = resource_dynamodb.Table(env.table_post_id)
-    url = parse_url(event=event)
+    # バッチ全体のslugを1回の問い合わせでまとめて解決し、保存はレコードごとに行う
+    resolution = resolve_post_ids(
+        posts_url=env.url_post, slugs=parse_slugs(event=event)
+    )
+    return process_sqs_batch(
+        event=event,
+        process_record=lambda record: resolve(
+            url=parse_url(record=record), resolution=resolution, table=table
+        ),
+    )
+
+
+def resolve(*, url: str, resolution: PostIdResolution, table: "Table"):
     if is_target(url=url):
         return
     slug = parse_slug(url=url)
-    post_id = get_post_id(slug=slug, url_post=env.url_post)
+    post_id = get_post_id(slug=slug, resolution=resolution)
     logger.info("url, slug, and post_id", url=url, slug=slug, post_id=post_id)
-    put_post_id(post_id=post_id, client=client_dynamodb, table=table)
+    put_post_id(post_id=post_id, table=table)
+
+
+@logger.logging_function(with_arg=False)
+def parse_slugs(*, event: dict) -> List[str]:
+    # 壊れたレコードは問い合わせの対象から外し、レコードごとの処理で失敗として報告させる
+    result = []
+    for record in event.get("Records", [event]):
+        try:
+            url = parse_url(record=record)
+            if not is_target(url=url):
+                result.append(parse_slug(url=url))
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning("failed to parse slug", error=e)
+    return result
 
 
 @logger.logging_function()
-def parse_url(*, event: dict) -> str:
-    if (url := event.get("url")) is not None:
+def parse_url(*, record: dict) -> str:
+    if (url := record.get("url")) is not None:
         return url
-    return event["Records"][0]["body"]
+    return record["body"]
 
 
 @logger.logging_function()
@@ -60,15 +86,17 @@ def parse_slug(*, url: str) -> str:
         return part[-1]
 
 
-@logger.logging_function()
-def get_post_id(*, slug: str, url_post: str) -> int:
-    resp = http_client_sec3(f"{url_post}?slug={slug}")
-    data = json.load(resp)
-    return [x["id"] for x in data if x["slug"] == slug][0]
+@logger.logging_function(with_arg=False)
+def get_post_id(*, slug: str, resolution: PostIdResolution) -> str:
+    if slug not in resolution.found:
+        raise ValueError(f"post id not found: slug={slug}")
+    return resolution.found[slug]
 
 
 @logger.logging_function()
-def put_post_id(*, post_id: int, client: DynamoDBClient, table: Table):
+def put_post_id(*, post_id: str, table: "Table"):
+    from boto3.dynamodb.conditions import Attr
+
     try:
         item = {"post_id": str(post_id)}
         logger.debug("put item", item=item)
@@ -76,5 +104,5 @@ def put_post_id(*, post_id: int, client: DynamoDBClient, table: Table):
             Item=item,
             ConditionExpression=Attr("post_id").not_exists(),
         )
-    except client.exceptions.ConditionalCheckFailedException:
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
         logger.debug("already exists")